@@ -0,0 +1,173 @@
+"""
+benchmarks.pipeline
+~~~~~~~~~~~~~~~~~~~
+
+Time every stage of the analysis on synthetic page views and prices. Nothing
+is downloaded and R is never started, so results only depend on our code.
+
+    python benchmarks/pipeline.py --symbols 500 --years 1 --output run.json
+"""
+from __future__ import print_function
+from argparse import ArgumentParser, Namespace
+import json
+from time import time
+
+from numpy import (
+    arange, asarray, cumsum, datetime64, exp, flatnonzero, nan, newaxis,
+    percentile
+)
+from numpy.random import RandomState
+
+from discerner import cruncher
+from discerner.analyze import get_pre_and_post_returns
+from discerner.quantiles import rolling_quantiles
+from discerner.results import EventResults
+
+START = "2013-01-01"
+INTERVALS = [5, 14]
+PROBABILITY = .9
+WINDOW = 365
+
+
+def make_fixtures(symbols, years, seed):
+    """
+    Generate daily page views for every symbol, with the occasional spike,
+    and calendar daily prices following a random walk with NaN weekends
+    """
+    random_state = RandomState(seed)
+    days = int(years * 365)
+    views = random_state.lognormal(7, .3, size=(symbols, days))
+    spikes = random_state.random_sample((symbols, days)) < .02
+    views[spikes] *= random_state.uniform(2, 10, size=spikes.sum())
+
+    steps = random_state.normal(0, .01, size=(symbols, days))
+    prices = 50 * exp(cumsum(steps, axis=1))
+    weekdays = (datetime64(START, "D") + arange(days)).astype(int) % 7
+    # 1970-01-01 was a thursday so days 2 and 3 are the weekend
+    prices[:, (weekdays == 2) | (weekdays == 3)] = nan
+    return views.round(), prices
+
+
+def make_args(symbols):
+    return Namespace(
+        pages=["SYM{}:Page_{}".format(n, n) for n in xrange(symbols)],
+        start=START, interval=INTERVALS, probability=[PROBABILITY],
+    )
+
+
+def time_stage(func, repeat):
+    """
+    Run func repeat times, returning its timings and its last result
+    """
+    seconds = []
+    for _ in xrange(repeat):
+        started = time()
+        result = func()
+        seconds.append(time() - started)
+    seconds.sort()
+    timing = {
+        "min": seconds[0],
+        "median": seconds[len(seconds) // 2],
+        "max": seconds[-1],
+    }
+    return timing, result
+
+
+def run(symbols, years, repeat, seed):
+    """
+    Time every stage, feeding each stage the output of the one before it
+    """
+    views, prices = make_fixtures(symbols, years, seed)
+    args = make_args(symbols)
+    dates = [
+        (datetime64(START, "D") + day).item().strftime("%Y-%m-%d")
+        for day in xrange(views.shape[1])
+    ]
+    stages = {}
+
+    def stage(name, func):
+        stages[name], result = time_stage(func, repeat)
+        return result
+
+    stage("get_pages", lambda: cruncher.get_pages(args))
+
+    try:
+        from memorandum.stats import find_highest_outliers
+    except ImportError:
+        print("memorandum is not installed, skipping find_highest_outliers")
+    else:
+        data = [dict(zip(dates, row.tolist())) for row in views]
+        stage("find_highest_outliers", lambda: [
+            find_highest_outliers(page, prob=[PROBABILITY]) for page in data
+        ])
+    stage("rolling_quantiles", lambda: rolling_quantiles(
+        views, WINDOW, PROBABILITY
+    ))
+    quantiles = percentile(views, PROBABILITY * 100, axis=1)
+    days = [flatnonzero(row > quantile) for row, quantile in zip(
+        views, quantiles
+    )]
+
+    stage("get_day_indices", lambda: [
+        cruncher.get_day_indices(
+            START, prices.shape[1], datetime64(START, "D") + outliers
+        )
+        for outliers in days
+    ])
+    stage("get_valid_indices", lambda: [
+        cruncher.get_valid_indices(row) for row in prices
+    ])
+    intervals = asarray(INTERVALS)[:, newaxis]
+    stage("get_event_windows", lambda: [
+        cruncher.get_event_windows(row, outliers, intervals)
+        for row, outliers in zip(prices, days)
+    ])
+
+    def evaluate():
+        results = EventResults()
+        for n, (row, outliers) in enumerate(zip(prices, days)):
+            get_pre_and_post_returns(
+                args, "SYM{}".format(n), outliers, row, results
+            )
+        return results
+    results = stage("get_pre_and_post_returns", evaluate)
+
+    pre, post = results.returns(INTERVALS[0])
+    stage("find_number_inflection_points", lambda: (
+        cruncher.find_number_inflection_points(pre, post)
+    ))
+    stage("make_returns_data", lambda: cruncher.make_returns_data(pre, post))
+    return {
+        "config": {
+            "symbols": symbols, "years": years, "repeat": repeat,
+            "seed": seed, "events": len(results),
+        },
+        "stages": stages,
+    }
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--symbols", type=int, default=500)
+    parser.add_argument("--years", type=float, default=1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write json results to this file")
+    args = parser.parse_args()
+
+    results = run(args.symbols, args.years, args.repeat, args.seed)
+    print("{} symbols, {} years, {} events".format(
+        args.symbols, args.years, results["config"]["events"]
+    ))
+    for name, timing in sorted(
+        results["stages"].iteritems(), key=lambda item: -item[1]["median"]
+    ):
+        print("{:>30}: median {:.4f}s".format(name, timing["median"]))
+
+    if args.output:
+        with open(args.output, "w") as file_:
+            json.dump(results, file_, indent=4, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
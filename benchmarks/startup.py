@@ -0,0 +1,94 @@
+"""
+benchmarks.startup
+~~~~~~~~~~~~~~~~~~
+
+Measure how long discerner takes to import what each mode needs, in a fresh
+interpreter per run, and which heavy dependencies each mode ends up loading.
+
+    python benchmarks/startup.py --runs 5 --output startup.json
+"""
+from __future__ import print_function
+from argparse import ArgumentParser
+import json
+import subprocess
+import sys
+
+HEAVY_MODULES = ("bs4", "memorandum", "numpy", "requests", "rpy2")
+
+# Statements importing what a run of every mode loads before its first
+# download
+MODES = {
+    "help": "from discerner.main import parse_argv",
+    "RECENT": (
+        "from discerner.main import parse_argv\\n"
+        "from discerner.analyze import analyze_pages"
+    ),
+    "HISTORICAL": (
+        "from discerner.main import parse_argv\\n"
+        "from discerner.analyze import analyze_pages\\n"
+        "from discerner.prices import CSVSource"
+    ),
+    "HISTORICAL-R": (
+        "from discerner.main import parse_argv\\n"
+        "from discerner.analyze import analyze_pages\\n"
+        "from discerner.prices import RSource\\n"
+        "RSource()"
+    ),
+}
+
+SCRIPT = """
+import json, sys, time
+start = time.time()
+exec("{statements}")
+elapsed = time.time() - start
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{"seconds": elapsed, "modules": heavy}}))
+"""
+
+
+def time_mode(statements, runs):
+    """
+    Run the import statements of a mode in runs fresh interpreters
+    """
+    script = SCRIPT.format(statements=statements, heavy=HEAVY_MODULES)
+    timings = []
+    for _ in range(runs):
+        output = subprocess.check_output([sys.executable, "-c", script])
+        timings.append(json.loads(output.decode("utf-8").splitlines()[-1]))
+    seconds = sorted(timing["seconds"] for timing in timings)
+    return {
+        "min": seconds[0],
+        "median": seconds[len(seconds) // 2],
+        "max": seconds[-1],
+        "modules": timings[-1]["modules"],
+    }
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--modes", nargs="*", choices=sorted(MODES), default=sorted(MODES)
+    )
+    parser.add_argument("--output", help="Write json results to this file")
+    args = parser.parse_args()
+
+    results = {}
+    for mode in args.modes:
+        try:
+            results[mode] = time_mode(MODES[mode], args.runs)
+        except subprocess.CalledProcessError:
+            print("{}: could not import what this mode needs".format(mode))
+            continue
+        print("{}: median {:.3f}s, loads {}".format(
+            mode, results[mode]["median"],
+            ", ".join(results[mode]["modules"]) or "nothing heavy"
+        ))
+
+    if args.output:
+        with open(args.output, "w") as file_:
+            json.dump(results, file_, indent=4, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
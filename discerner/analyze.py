@@ -3,86 +3,325 @@ discerner.analyze
 ~~~~~~~~~~~~~~~~~
 """
 from __future__ import print_function
-from random import randint
+from logging import DEBUG
+from multiprocessing import Pool
+from os.path import splitext
 from time import time
+from zlib import crc32
 
-from memorandum.finder import get_yearly_data
-from memorandum.exceptions import HTTPStatusCodeError
 from memorandum.stats import find_highest_outliers
 from memorandum.utils import convert_wiki_date_to_datetime
-from requests.exceptions import ConnectionError
+from numpy import (
+    arange, asarray, count_nonzero, datetime64, empty, float64, full, nan
+)
+from numpy.random import RandomState
 
-from discerner import cruncher
-from discerner.constants import RANDOM_VIEWS_PER_STOCK
-from discerner.defaults import logger
-from discerner.exceptions import SkipEvaluationError
-
-# XXX Globals feels pretty weird.
-pre_rets = []
-post_rets = []
+from discerner import cruncher, stats
+from discerner.defaults import logger, rolling_block
+from discerner.export import EventExporter
+from discerner.fetcher import fetch_page_views
+from discerner.metrics import metrics
+from discerner.pipeline import batch, map_processes, map_threaded
+from discerner.prices import PRICE_ERRORS, get_price_source
+from discerner.quantiles import find_rolling_outliers
+from discerner.results import EventResults
+from discerner.store import resolve_prices
 
 
 def analyze_pages(func, args):
     """
-    Base function for analyzing wiki pages
+    Base function for analyzing wiki pages. Pages stream through a pipeline
+    of page view fetching, price loading and per symbol analysis stages whose
+    results are aggregated as they arrive. Returns the EventResults of all
+    evaluated events. With --export every event is also streamed to disk as
+    soon as its symbol has been analyzed
+    """
+    results = EventResults()
+    pages = cruncher.get_pages(args).iteritems()
+    if args.data_type == "RANDOM":
+        views = ((key, page, None) for key, page in pages)
+    else:
+        views = fetch_page_views(args, pages)
+        if args.detector == "rolling":
+            views = detect_rolling_outliers(args, views)
+
+    skipped = []
+    tasks = (
+        (func, args, key, page, data) for key, page, data in views
+        if not skip_page(args, key, page, data, skipped)
+    )
+    tasks = (
+        task for task in map_threaded(load_prices, tasks, args.workers)
+        if not skip_prices(args, task, skipped)
+    )
+    index = None
+    if args.event_study and args.benchmark == "equal":
+        index = stats.EqualWeightedIndex()
+        tasks = add_to_index(tasks, index)
+    exporter = EventExporter(args.export) if args.export else None
+    try:
+        if args.processes > 1:
+            pool = Pool(args.processes)
+            try:
+                for symbol_results, snapshot in map_processes(
+                    analyze_symbol_in_process, (
+                        share_prices(task) for task in tasks
+                    ), pool, args.processes * 2
+                ):
+                    metrics.merge(snapshot)
+                    add_results(results, symbol_results, exporter)
+            finally:
+                pool.terminate()
+                pool.join()
+        else:
+            for task in tasks:
+                add_results(results, analyze_symbol(task), exporter)
+    finally:
+        if exporter:
+            exporter.close()
+
+    if skipped:
+        logger.warn("Skipped {} symbols: {}".format(
+            len(skipped), ", ".join(sorted(skipped))
+        ))
+    results.sort()
+    with metrics.timer("perform_analysis"):
+        perform_analysis(args, results)
+    curve = None
+    if args.event_study:
+        with metrics.timer("event_study"):
+            curve = perform_event_study(args, results, index)
+    perform_final_action(args, results, curve)
+    if metrics.enabled:
+        metrics.report(args.metrics_output)
+    return results
+
+
+class DetectedViews(dict):
+    """
+    Page views along with the (outliers, quantile) found in them for every
+    probability
+    """
+    def __init__(self, views, detected):
+        dict.__init__(self, views)
+        self.detected = detected
+
+
+def detect_rolling_outliers(args, views):
+    """
+    Find the rolling outliers of blocks of pages at once as their views are
+    fetched, passing every page on with DetectedViews. Pages whose views
+    could not be fetched are passed on as they are
+    """
+    for block in batch(views, rolling_block):
+        pages = [data for _, _, data in block if data is not None]
+        with metrics.timer("detect_rolling_outliers"):
+            detected = {
+                probability: iter(find_rolling_outliers(
+                    pages, args.window, probability, args.min_periods
+                ))
+                for probability in args.probability
+            }
+        for key, page, data in block:
+            if data is not None:
+                data = DetectedViews(data, {
+                    probability: next(outliers)
+                    for probability, outliers in detected.iteritems()
+                })
+            yield key, page, data
+
+
+def add_to_index(tasks, index):
+    """
+    Add the prices of every task to an equal weighted index as the tasks go
+    by
+    """
+    for task in tasks:
+        index.add(cruncher.get_log_prices(task[-1]))
+        yield task
+
+
+def add_results(results, symbol_results, exporter=None):
+    """
+    Merge the results of a symbol into our results, streaming them to our
+    export as well if we have one
+    """
+    results.merge(symbol_results)
+    if exporter:
+        exporter.write(symbol_results)
+
+
+def analyze_symbol(task):
+    """
+    Analyze the page views and prices of a single symbol. Takes a single
+    (func, args, symbol, page, data, prices) tuple and returns an EventResults
+    object so that it can be run in a worker process
     """
-    cruncher.load_r_funcs()
-    pages = cruncher.get_pages(args)
+    func, args, key, page, data, prices = task
     mapping = {
         "RANDOM": lambda *args: (None, None),
         "RECENT": analyze_page_view_data, 
         "HISTORICAL": analyze_page_view_data
     }
+    logger.info("Analyzing for symbol: {}, page: {}".format(key, page))
+    results = EventResults()
+    results.pages[key] = page
+    # Random views do not depend on the probability so only draw them once
+    probabilities = (
+        [nan] if args.data_type == "RANDOM" else args.probability
+    )
+    with metrics.timer("analyze", key):
+        for probability in probabilities:
+            with metrics.timer("detect_outliers", key):
+                outliers, quantile = mapping[args.data_type](
+                    args, data, probability
+                )
+            func(args, key, outliers, quantile, results, prices, probability)
+        if args.baseline and args.data_type == "HISTORICAL":
+            for_random_views(args, key, None, None, results, prices)
+    return results
 
-    for key, page in pages.iteritems():
-        logger.info("Analyzing for symbol: {}, page: {}".format(key, page))
-        outliers, quantile = mapping[args.data_type](args, key, page)
-        func(args, key, outliers, quantile)
 
-    perform_analysis(args)
-    perform_final_action(args)
+def share_prices(task):
+    """
+    Replace prices loaded from the price store with their reference, so that
+    worker processes map them instead of receiving a copy
+    """
+    reference = getattr(task[-1], "reference", None)
+    if reference is None:
+        return task
+    return task[:-1] + (reference,)
 
 
-def analyze_page_view_data(args, key, page):
+def analyze_symbol_in_process(task):
     """
-    For RECENT and HISTORICAL viewing get wikipedia page views stats and 
-    analyze them
+    Run analyze_symbol in a worker process, returning the metrics it recorded
+    along with its results so that they can be merged into ours
     """
-    try:
-        data = get_yearly_data(page)
-    except (ConnectionError, HTTPStatusCodeError) as error:
-        logger.warn(error.message)
-       
-    outliers, quantile = find_highest_outliers(
-        data, prob=[args.probability]
-    )
+    metrics.reset()
+    results = analyze_symbol(task[:-1] + (resolve_prices(task[-1]),))
+    return results, metrics.snapshot()
+
+
+def analyze_page_view_data(args, data, probability):
+    """
+    For RECENT and HISTORICAL viewing analyze the wikipedia page view stats
+    fetched for a page, either against the probability quantile of all of
+    its views or against a rolling window of its views. Rolling outliers
+    are usually detected ahead for a whole block of pages
+    """
+    if isinstance(data, DetectedViews):
+        return data.detected[probability]
+    if args.detector == "rolling":
+        return find_rolling_outliers(
+            [data], args.window, probability, args.min_periods
+        )[0]
+    outliers, quantile = find_highest_outliers(data, prob=[probability])
     return outliers, quantile
 
 
-def for_historical_views(args, key, outliers, quantile):
+def load_prices(task):
+    """
+    Add the prices of the symbol a task is for to the task, None if they
+    could not be loaded. RECENT checks do not need prices
+    """
+    func, args, key, page, data = task
+    if args.data_type == "RECENT":
+        return task + (None,)
+    try:
+        with metrics.timer("load_prices", key):
+            prices = cruncher.get_stock_data(args, key)
+    except PRICE_ERRORS as error:
+        logger.warn("Could not load prices of {}: {}".format(key, error))
+        prices = None
+    return task + (prices,)
+
+
+def skip_page(args, key, page, data, skipped):
+    """
+    Check if we have to skip a page because its views could not be fetched,
+    adding it to the list of skipped symbols
     """
-    Analyze all desired wikipedia pages over the current year for trends
-    involving outliers in page views and accompanying changes in stock
+    if data is None and args.data_type != "RANDOM":
+        logger.warn("Skipping symbol: {}, page: {}".format(key, page))
+        skipped.append(key)
+        return True
+    return False
+
+
+def skip_prices(args, task, skipped):
+    """
+    Check if we have to skip a symbol because its prices could not be loaded,
+    adding it to the list of skipped symbols
+    """
+    key, prices = task[2], task[-1]
+    if prices is None and args.data_type != "RECENT":
+        skipped.append(key)
+        return True
+    return False
+
+
+def for_historical_views(args, key, outliers, quantile, results, prices,
+                         probability=nan):
+    """
+    Analyze all desired wikipedia pages over the requested date range for
+    trends involving outliers in page views and accompanying changes in stock
     prices 10 business days afterwards.
     """
-    prices = cruncher.get_stock_data(args, key)
-    for date, val in outliers:
-        day_of_year = int(
-            convert_wiki_date_to_datetime(date).strftime("%j")) - 1
-        get_pre_and_post_returns(args, day_of_year, prices)
+    dates = [
+        convert_wiki_date_to_datetime(date).date() for date, _ in outliers
+    ]
+    views = asarray([val for _, val in outliers], dtype=float64)
+    days, outside = cruncher.get_day_indices(args.start, len(prices), dates)
+    get_pre_and_post_returns(
+        args, key, days[~outside], prices, results, views=views[~outside],
+        quantile=quantile, probability=probability
+    )
+    if args.event_study:
+        days = days[~outside]
+        curves = cruncher.get_cumulative_returns(
+            cruncher.get_log_prices(prices), days, max(args.interval)
+        )
+        results.append_curves(
+            key, datetime64(args.start, "D") + days, curves, probability
+        )
 
 
-def for_random_views(args, key, *other_args):
+def for_random_views(args, key, outliers, quantile, results, prices,
+                     probability=nan):
     """
     Analyze data for a completely random set of views
     """
-    prices = cruncher.get_stock_data(args, key)
-    for _ in xrange(RANDOM_VIEWS_PER_STOCK):
-        day = randint(args.interval, len(prices) - args.interval)
-        get_pre_and_post_returns(args, day, prices)
+    days = get_random_days(args, key, prices)
+    get_pre_and_post_returns(args, key, days, prices, results, random=True)
 
 
-def for_recent_views(args, key, outliers, quantile):
+def get_random_days(args, key, prices):
+    """
+    Draw args.random_views random event days for a symbol, leaving room for
+    our longest interval on both sides
+    """
+    low = max(args.interval)
+    high = len(prices) - max(args.interval)
+    if high < low:
+        return empty(0, dtype=int)
+    random_state = get_random_state(args, key)
+    return random_state.randint(low, high + 1, size=args.random_views)
+
+
+def get_random_state(args, key=""):
+    """
+    Get a random number generator for a symbol. When a seed is given every
+    symbol gets its own stream derived from it, so draws do not depend on the
+    order or the process symbols are analyzed in
+    """
+    if args.seed is None:
+        return RandomState()
+    return RandomState([args.seed, crc32(key) & 0xffffffff])
+
+
+def for_recent_views(args, key, outliers, quantile, results, prices,
+                     probability=nan):
     """
     Analyze all desired wikipedia for recent outliers. Respond to user if the
     company has generated an outlier within the past number of user specified
@@ -97,59 +336,207 @@ def for_recent_views(args, key, outliers, quantile):
             print(key, date, val, quantile)
 
 
-def get_pre_and_post_returns(args, day, prices):
+def get_pre_and_post_returns(args, key, days, prices, results, random=False,
+                             views=None, quantile=nan, probability=nan):
     """
-    Append pre and post return data
+    Add pre and post return data for every event day of a price series and
+    every interval to our results. random marks days that were drawn at
+    random, views and quantile are the page views of outlier days and the
+    threshold they beat at probability
     """
-    try:
-        pre_start = cruncher.get_end_index(
-            prices, day, index=-1 * args.interval
+    if views is None:
+        views = full(len(days), nan, dtype=float64)
+    with metrics.timer("window_returns", key):
+        pre, post, invalid = cruncher.get_window_returns(
+            prices, days, args.interval
         )
-        pre_end = cruncher.get_end_index(
-            prices, pre_start, index=args.interval - 1
+    dates = datetime64(args.start, "D") + days
+    for row, interval in enumerate(args.interval):
+        if invalid[row].any() and logger.isEnabledFor(DEBUG):
+            logger.debug(
+                "The days %s do not support being evaluated over %s days",
+                days[invalid[row]], interval
+            )
+        valid = ~invalid[row]
+        events = int(count_nonzero(valid))
+        metrics.count("events", events, key)
+        metrics.count("skipped_events", len(valid) - events, key)
+        results.append(
+            key, dates[valid], interval, pre[row][valid], post[row][valid],
+            random, views[valid], quantile, probability
         )
-        post_start = cruncher.get_start_index(prices, day, index=1)
-        post_end = cruncher.get_end_index(
-            prices, post_start, index=args.interval - 1
+
+
+def perform_analysis(args, results):
+    """
+    Perform analysis on returned data
+    """
+    if args.data_type not in ("HISTORICAL", "RANDOM"):
+        return
+
+    random = args.data_type == "RANDOM"
+    random_state = get_random_state(args)
+    if not random and len(args.probability) > 1:
+        print_sweep_table(args, results, random_state)
+        return
+
+    for interval in results.intervals(random):
+        pre, post = results.returns(interval, random)
+        inflection_data = cruncher.find_number_inflection_points(pre, post)
+        print(
+            "Interval: {}, Number of inflection points: {}, "
+            "Percentage Inflection points: {}".format(
+                interval, inflection_data[0], inflection_data[1]
+            )
         )
-    except SkipEvaluationError:
-        logger.debug(
-            "The day {} does not support being evaluated".format(day)
+        print_conditional_returns(pre, post)
+        baseline_pre, baseline_post = results.returns(interval, random=True)
+        if random or not len(baseline_pre):
+            continue
+
+        flips = stats.sign_flips(pre, post)
+        baseline_flips = stats.sign_flips(baseline_pre, baseline_post)
+        difference, p_value = stats.compare_flip_rates(
+            flips, baseline_flips, args.resamples, random_state
         )
-    else:
-        logger.debug("Appending to returns")
-        pre_rets.append(
-            (prices[pre_end] - prices[pre_start]) / prices[pre_start]
+        low, high = stats.bootstrap_flip_rate(
+            flips, args.resamples, random_state
         )
-        post_rets.append(
-            (prices[post_end] - prices[post_start]) / prices[post_start]
+        print(
+            "    Baseline Percentage Inflection points: {}, Difference: {}, "
+            "p-value: {}, 95% interval: {} - {}".format(
+                baseline_flips.mean(), difference, p_value, low, high
+            )
         )
 
 
-def perform_analysis(args):
+def print_sweep_table(args, results, random_state):
     """
-    Perform analysis on returned data
+    Print one row of results for every probability and interval we swept
+    over. All combinations were evaluated from the same fetched views and
+    prices
     """
-    if args.data_type in ("HISTORICAL", "RANDOM"):
-        inflection_data = cruncher.find_number_inflection_points(
-            pre_rets, post_rets
-        )
+    columns = (
+        "probability", "interval", "events", "flip rate", "mean post",
+        "base rate", "p-value"
+    )
+    print(" ".join("{:>11}".format(column) for column in columns))
+    for probability in args.probability:
+        for interval in args.interval:
+            pre, post = results.returns(interval, probability=probability)
+            flips = stats.sign_flips(pre, post)
+            baseline_pre, baseline_post = results.returns(
+                interval, random=True
+            )
+            baseline_flips = stats.sign_flips(baseline_pre, baseline_post)
+            _, p_value = stats.compare_flip_rates(
+                flips, baseline_flips, args.resamples, random_state
+            )
+            print(
+                "{:>11} {:>11} {:>11} {:>11.4f} {:>11.4f} {:>11.4f} "
+                "{:>11.4f}".format(
+                    probability, interval, len(pre),
+                    flips.mean() if len(flips) else nan,
+                    post.mean() if len(post) else nan,
+                    baseline_flips.mean() if len(baseline_flips) else nan,
+                    p_value
+                )
+            )
+
+
+def print_conditional_returns(pre, post):
+    """
+    Print the distribution of post returns depending on the pre return
+    """
+    distributions = stats.conditional_returns(pre, post)
+    for name in ("up", "down", "flat"):
+        distribution = distributions[name]
+        if not distribution["count"]:
+            continue
         print(
-            "Number of inflection points: {}, "
-            "Percentage Inflection points: {}".format(
-                inflection_data[0], inflection_data[1]
+            "    Pre return {}: events: {}, mean post return: {}, "
+            "post return percentiles: {}".format(
+                name, distribution["count"], distribution["mean"],
+                ", ".join(
+                    "{}%: {:.4f}".format(percent, value) for percent, value
+                    in sorted(distribution["percentiles"].iteritems())
+                )
+            )
+        )
+
+
+def perform_event_study(args, results, index=None):
+    """
+    Subtract the cumulative returns of our benchmark, SPY or the equal
+    weighted index of all our stocks, from the cumulative returns around our
+    outlier events. Prints and returns the day offsets along with the average
+    cumulative abnormal return and its confidence band, None if there is no
+    benchmark or no event to study
+    """
+    interval = max(args.interval)
+    dates, curves = results.curves(args.probability[0])
+    if not len(curves):
+        logger.warn("No outlier events to run an event study on")
+        return None
+    days = (dates - datetime64(args.start, "D")).astype(int)
+    if index is not None:
+        benchmark = index.log_prices()
+    else:
+        try:
+            benchmark = cruncher.get_log_prices(
+                get_price_source(args).load("SPY", args.start, args.end)
             )
+        except PRICE_ERRORS as error:
+            logger.warn("Could not load benchmark prices: {}".format(error))
+            return None
+
+    abnormal = curves - cruncher.get_cumulative_returns(
+        benchmark, days, interval
+    )
+    offsets = arange(-interval, interval + 1)
+    mean, low, high = stats.mean_curve(abnormal)
+    print("Event study: {} events against {}".format(
+        len(abnormal), args.benchmark
+    ))
+    for offset, values in zip(offsets, zip(mean, low, high)):
+        print(
+            "    Day {:>4}: mean CAR: {:.4f}, 95% interval: {:.4f} - "
+            "{:.4f}".format(offset, *values)
         )
+    return offsets, mean, low, high
 
 
-def perform_final_action(args):
+def perform_final_action(args, results, curve=None):
     """
     Depending on whether we are looking for historical or recent views, perform
-    the last action
+    the last action. Event studies plot their average abnormal return curve
     """
-    mapping = {
-        "HISTORICAL": cruncher.make_plot,
-        "RANDOM": cruncher.make_plot,
-        "RECENT": lambda *args: logger.info("Finished")
-    }
-    mapping[args.data_type](pre_rets, post_rets)
+    if args.data_type == "RECENT" or args.no_plot:
+        logger.info("Finished")
+        return
+
+    if curve is not None:
+        cruncher.make_curve_plot(*curve, output=args.plot_output)
+        if args.plot_output:
+            logger.info("Wrote plot to {}".format(args.plot_output))
+        return
+
+    random = args.data_type == "RANDOM"
+    # Sweeps are plotted at their first probability
+    probability = None if random else args.probability[0]
+    if not args.plot_output:
+        # Only one plot can be shown at a time so show the first interval
+        cruncher.make_plot(
+            *results.returns(args.interval[0], random, probability)
+        )
+        return
+
+    intervals = results.intervals(random)
+    for interval in intervals:
+        output = args.plot_output
+        if len(intervals) > 1:
+            output = "{1}_{0}{2}".format(interval, *splitext(output))
+        cruncher.make_plot(
+            *results.returns(interval, random, probability), output=output
+        )
+        logger.info("Wrote plot to {}".format(output))
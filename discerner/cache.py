@@ -0,0 +1,245 @@
+"""
+discerner.cache
+~~~~~~~~~~~~~~~
+"""
+from datetime import datetime, timedelta
+from hashlib import sha1
+import json
+import os
+from os.path import exists, expanduser, getmtime, join
+from threading import Lock
+from time import time
+
+from memorandum.utils import convert_wiki_date_to_datetime
+from numpy import (
+    concatenate, flatnonzero, float64, full, isnan, load, nan, savez
+)
+
+from discerner.defaults import logger
+from discerner.metrics import metrics
+from discerner.utils import add_days, days_between, today
+
+
+def make_cache_dir(directory, name):
+    """
+    Create and return the cache subdirectory `name` inside of directory
+    """
+    path = join(expanduser(directory), name)
+    if not exists(path):
+        try:
+            os.makedirs(path)
+        except OSError:
+            # Another worker may have created it in the meantime
+            if not exists(path):
+                raise
+    return path
+
+
+def write_atomic(path, dump, obj):
+    """
+    Write obj to path using dump, making sure readers never see a partially
+    written file
+    """
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+    with open(tmp_path, "wb") as file_:
+        dump(obj, file_)
+    os.rename(tmp_path, path)
+
+
+class PageViewCache(object):
+    """
+    On disk cache of daily wikipedia page views. Every page is stored in its
+    own json file named after the sha1 of the page title, and kept in memory
+    once it has been read for the life of the process
+    """
+    def __init__(self, directory, ttl, max_age):
+        self.directory = make_cache_dir(directory, "views")
+        self.ttl = ttl
+        self.max_age = max_age
+        self.memo = {}
+
+    def path(self, page):
+        return join(self.directory, sha1(page.encode("utf-8")).hexdigest())
+
+    def load(self, page):
+        """
+        Return the cached record for page or None if we have not seen it
+        """
+        if page in self.memo:
+            return self.memo[page]
+        path = self.path(page)
+        try:
+            with open(path) as file_:
+                record = json.load(file_)
+        except (IOError, ValueError):
+            return None
+        os.utime(path, None)
+        self.memo[page] = record
+        return record
+
+    def store(self, page, views):
+        record = {"page": page, "fetched": time(), "views": views}
+        write_atomic(self.path(page), json.dump, record)
+        self.memo[page] = record
+        return record
+
+    def is_fresh(self, record):
+        """
+        Past days never change, so a record is fresh if it already holds
+        yesterday's views or if we have refreshed it within our ttl
+        """
+        if time() - record["fetched"] < self.ttl:
+            return True
+        last = last_day(record["views"])
+        yesterday = datetime.today() - timedelta(days=1)
+        return last is not None and last.date() >= yesterday.date()
+
+    def get(self, page, fetch, start=None, end=None):
+        """
+        Get views for page between the start and end datetimes, only calling
+        fetch(page) if our cached copy is stale. A refresh replaces the days
+        we have with the ones fetched, so cached views always cover the same
+        days as an uncached download would.
+        """
+        record = self.load(page)
+        if record is None or not self.is_fresh(record):
+            logger.debug("Cache miss for page views of %s", page)
+            metrics.count("view_cache_misses")
+            record = self.store(page, fetch(page))
+        else:
+            logger.debug("Cache hit for page views of %s", page)
+            metrics.count("view_cache_hits")
+
+        return views_in_range(record["views"], start, end)
+
+    def evict(self):
+        """
+        Remove all pages that have not been read within our max age
+        """
+        cutoff = time() - self.max_age
+        for name in os.listdir(self.directory):
+            path = join(self.directory, name)
+            if getmtime(path) < cutoff:
+                logger.debug("Evicting cached page views %s", name)
+                os.remove(path)
+
+
+class PriceCache(object):
+    """
+    Wrap a price source so that each symbol is downloaded at most once a day.
+    Prices are kept in memory for the life of the process and on disk as one
+    npz file per symbol. Refreshing a symbol only downloads the days after the
+    last price we have.
+    """
+    def __init__(self, source, directory):
+        self.source = source
+        self.directory = make_cache_dir(directory, "prices")
+        self.memo = {}
+        self.lock = Lock()
+        self.symbol_locks = {}
+
+    def path(self, symbol):
+        return join(self.directory, "{}.npz".format(symbol))
+
+    def symbol_lock(self, symbol):
+        with self.lock:
+            return self.symbol_locks.setdefault(symbol, Lock())
+
+    def read(self, symbol):
+        """
+        Return the stored record for symbol, None if we do not have one
+        """
+        try:
+            with open(self.path(symbol), "rb") as file_:
+                stored = load(file_)
+                return {
+                    "start": stored["start"].item(),
+                    "fetched": stored["fetched"].item(),
+                    "closes": stored["closes"],
+                }
+        except (IOError, KeyError, ValueError):
+            return None
+
+    def store(self, symbol, record):
+        write_atomic(
+            self.path(symbol), lambda obj, file_: savez(file_, **obj), record
+        )
+        return record
+
+    def download(self, symbol, start, end):
+        """
+        Download prices from start to end, dropping the NaNs after the last
+        quote so that those days are downloaded again on the next refresh
+        """
+        closes = self.source.load(symbol, start, end)
+        quoted = flatnonzero(~isnan(closes))
+        return closes[:quoted[-1] + 1 if len(quoted) else 0]
+
+    def refresh(self, symbol, record, start, end):
+        """
+        Bring the record for symbol up to date for the start to end range
+        """
+        fetched = today()
+        if record is None or days_between(record["start"], start) < 0:
+            logger.debug("Cache miss for prices of %s", symbol)
+            metrics.count("price_cache_misses")
+            closes = self.download(symbol, start, end)
+            record = {"start": start, "closes": closes}
+        elif record["fetched"] != fetched:
+            next_day = add_days(record["start"], len(record["closes"]))
+            if days_between(next_day, end) < 0:
+                return record
+            logger.debug("Appending new prices for %s", symbol)
+            metrics.count("price_cache_appends")
+            closes = self.download(symbol, next_day, end)
+            record["closes"] = concatenate((record["closes"], closes))
+        else:
+            metrics.count("price_cache_hits")
+            return record
+
+        record["fetched"] = fetched
+        return self.store(symbol, record)
+
+    def load(self, symbol, start, end):
+        """
+        Load daily prices from start to end, downloading only what we are
+        missing
+        """
+        with self.symbol_lock(symbol):
+            record = self.memo.get(symbol) or self.read(symbol)
+            record = self.refresh(symbol, record, start, end)
+            self.memo[symbol] = record
+
+        offset = days_between(record["start"], start)
+        length = days_between(start, end) + 1
+        closes = record["closes"][offset:offset + length]
+        if len(closes) < length:
+            missing = full(length - len(closes), nan, dtype=float64)
+            closes = concatenate((closes, missing))
+        return closes
+
+
+def last_day(views):
+    """
+    Return the datetime of the most recent day in views, None if it is empty
+    """
+    if not views:
+        return None
+    return max(convert_wiki_date_to_datetime(date) for date in views)
+
+
+def in_range(date, start=None, end=None):
+    """
+    Check if date falls within the optional start and end bounds
+    """
+    return (start is None or date >= start) and (end is None or date <= end)
+
+
+def views_in_range(views, start=None, end=None):
+    """
+    Keep only the days of views that fall within the start and end datetimes
+    """
+    return {
+        date: val for date, val in views.iteritems()
+        if in_range(convert_wiki_date_to_datetime(date), start, end)
+    }
@@ -4,7 +4,10 @@ discerner.constants
 """
 DAYS = 2
 NEW_YEARS_2013 = "2013-01-01"
-# XXX Make configurable
-RANDOM_VIEWS_PER_STOCK = 8
+PAGE_VIEWS_HOST = "stats.grok.se"
+PLOT_DATA_FORMATS = ("csv", "npz")
+PLOT_DEVICES = {"pdf": "pdf", "png": "png", "svg": "svg"}
+PRICE_CSV_COLUMN = "Adj Close"
+PRICE_CSV_DATE_COLUMN = "Date"
 SP500_TABLE_CLASS = "wikitable"
 SP500_URL = "http://en.wikipedia.org/wiki/List_of_S%26P_500_companies"
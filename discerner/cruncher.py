@@ -2,21 +2,21 @@
 discerner.cruncher
 ~~~~~~~~~~~~~~~~~~
 """
-from datetime import datetime
-from operator import add, sub
-from os.path import dirname, join, realpath
+from os.path import dirname, join, realpath, splitext
 import signal
 import sys
 
-from discerner.constants import NEW_YEARS_2013
 from discerner.defaults import logger
+from discerner.constants import PLOT_DATA_FORMATS, PLOT_DEVICES
 from discerner.exceptions import SkipEvaluationError
-from numpy import asarray
-from rpy2 import robjects
-from rpy2.robjects import numpy2ri
-from rpy2.rinterface import NARealType
-
-today = datetime.today().strftime("%Y-%m-%d")
+from discerner.prices import get_price_source
+from discerner.stats import sign_flips
+from numpy import (
+    arange, argsort, asarray, broadcast_to, clip, column_stack, concatenate,
+    count_nonzero, datetime64, float64, full, isnan, log, maximum, minimum,
+    nan, newaxis, ones, savetxt, savez, searchsorted, where
+)
+from numpy.lib.stride_tricks import as_strided
 
 
 def find_non_nan(data, index, reverse=False):
@@ -24,33 +24,19 @@ def find_non_nan(data, index, reverse=False):
     If a NaN has been identified at data[index] find the next position in our
     data where a NaN is not present
     """
-    if reverse:
-        data = data[:index + 1]
-        data.reverse()
-        op = sub
-    else:
-        data = data[index:]
-        op = add
-
-    for position, price in enumerate(data):
-        if not isinstance(price, NARealType):
-            return op(index, position)
-    else:
+    previous, next_ = get_valid_indices(data)
+    position = previous[index] if reverse else next_[index]
+    if not 0 <= position < len(data):
         raise SkipEvaluationError()
+    return position
 
 
 def find_number_inflection_points(pre, post):
     """
     Given our return data find how many inflection points we have
     """
-    inflections = 0
-    rets = zip(pre, post)
-    eval_ = lambda x: ((x[0] > 0 and x[1] < 0) or (x[0] < 0 and x[1] > 0))
-    for i in rets:
-        if eval_(i):
-            inflections += 1
-
-    return inflections, float(inflections) / len(rets)
+    inflections = count_nonzero(sign_flips(pre, post))
+    return inflections, float(inflections) / len(pre)
 
 
 def get_pages(args):
@@ -64,76 +50,224 @@ def get_pages(args):
         logger.debug("Returning a custom set of pages")
         return {pair.split(":")[0]: pair.split(":")[1] for pair in args.pages}
     else:
-        logger.debug("Returning pages for {}".format(args.pages.__name__))
-        return args.pages()
+        logger.debug("Returning pages for %s", args.pages.__name__)
+        return args.pages(args)
+
+
+def get_cumulative_returns(log_prices, days, interval):
+    """
+    Build the events x offsets matrix of cumulative log returns from the
+    start of every event window, interval days before the event, to each day
+    up to interval days after it. Rows are taken from a zero copy sliding
+    window view of the series, so only the event rows are copied. Offsets
+    beyond the end of the series are NaN, as are whole windows starting
+    before it.
+    """
+    padding = full(interval, nan, dtype=float64)
+    padded = concatenate((padding, log_prices, padding))
+    stride = padded.strides[0]
+    windows = as_strided(
+        padded, shape=(len(log_prices), 2 * interval + 1),
+        strides=(stride, stride)
+    )
+    rows = windows[asarray(days, dtype=int)]
+    return rows - rows[:, :1]
+
+
+def get_day_indices(start, length, dates):
+    """
+    Locate dates on the date axis of a price series of length days beginning
+    at start by binary search. Returns the day indices along with a mask of
+    dates that fall outside of the series.
+    """
+    axis = datetime64(start, "D") + arange(length)
+    dates = asarray(dates, dtype="datetime64[D]")
+    days = searchsorted(axis, dates)
+    found = days < length
+    found[found] = axis[days[found]] == dates[found]
+    return days, ~found
 
 
 def get_end_index(prices, start, index=13):
     """
     Get final date to look for in historical data
     """
-    if start + index > len(prices) - 1:
-        end = find_non_nan(prices, len(prices) - 1, reverse=True)
-        if end <= start:
-            raise SkipEvaluationError()
-        return end
-    
-    if isinstance(prices[start + index], NARealType):
-        return find_non_nan(prices, start + index, reverse=True)
-    else:
-        return start + index
+    previous, _ = get_valid_indices(prices)
+    ends, invalid = get_end_indices(previous, asarray([start]), index)
+    if invalid[0]:
+        raise SkipEvaluationError()
+    return ends[0]
+
+
+def get_end_indices(previous, starts, index=13):
+    """
+    Vectorized get_end_index. Resolve the final date of windows beginning at
+    each of starts using the previous valid index array of a price series.
+    Returns the end indices along with a mask of windows that cannot be
+    evaluated.
+    """
+    size = len(previous)
+    targets = starts + index
+    if not size:
+        return targets, ones(targets.shape, dtype=bool)
+
+    beyond = targets > size - 1
+    ends = where(beyond, previous[-1], previous[clip(targets, 0, size - 1)])
+    invalid = (targets < 0) | (ends < 0) | (beyond & (ends <= starts))
+    return ends, invalid
+
+
+def get_event_windows(prices, days, interval):
+    """
+    Resolve the pre and post windows around every event day of a price series
+    in a single pass. Returns the pre start, pre end, post start and post end
+    indices along with a mask of events that cannot be evaluated. interval
+    may be a column of intervals to resolve windows for all of them at once.
+    """
+    previous, next_ = get_valid_indices(prices)
+    days = asarray(days, dtype=int)
+    pre_start, invalid_pre_start = get_end_indices(previous, days, -interval)
+    pre_end, invalid_pre_end = get_end_indices(
+        previous, pre_start, interval - 1
+    )
+    post_start, invalid_post_start = get_start_indices(next_, days, 1)
+    post_end, invalid_post_end = get_end_indices(
+        previous, post_start, interval - 1
+    )
+    invalid = (
+        invalid_pre_start | invalid_pre_end | invalid_post_start |
+        invalid_post_end
+    )
+    return pre_start, pre_end, post_start, post_end, invalid
+
+
+def get_window_returns(prices, days, intervals):
+    """
+    Compute the pre and post returns around every event day for every
+    interval at once. Returns pre and post return arrays shaped
+    (len(intervals), len(days)) along with a mask of the same shape flagging
+    windows that cannot be evaluated, whose returns are NaN.
+    """
+    prices = asarray(prices, dtype=float64)
+    intervals = asarray(intervals, dtype=int)[:, newaxis]
+    pre_start, pre_end, post_start, post_end, invalid = get_event_windows(
+        prices, days, intervals
+    )
+    shape = invalid.shape
+    pre = get_returns(prices, pre_start, pre_end, invalid, shape)
+    post = get_returns(prices, post_start, post_end, invalid, shape)
+    return pre, post, invalid
+
+
+def get_returns(prices, starts, ends, invalid, shape):
+    """
+    Compute the returns from starts to ends, leaving NaN where invalid
+    """
+    starts = where(invalid, 0, broadcast_to(starts, shape))
+    ends = where(invalid, 0, broadcast_to(ends, shape))
+    returns = (prices[ends] - prices[starts]) / prices[starts]
+    returns[invalid] = nan
+    return returns
 
 
 def get_start_index(prices, day, index=1):
     """
     Get start date to look for in historical data
     """
-    if day + index > len(prices) - 1:
+    _, next_ = get_valid_indices(prices)
+    starts, invalid = get_start_indices(next_, asarray([day]), index)
+    if invalid[0]:
         raise SkipEvaluationError()
+    return starts[0]
 
-    if isinstance(prices[day + index], NARealType):
-        return find_non_nan(prices, day + index)
-    else:
-        return day + index
+
+def get_start_indices(next_, days, index=1):
+    """
+    Vectorized get_start_index. Resolve the first date of windows following
+    each of days using the next valid index array of a price series. Returns
+    the start indices along with a mask of windows that cannot be evaluated.
+    """
+    size = len(next_)
+    targets = days + index
+    if not size:
+        return targets, ones(targets.shape, dtype=bool)
+
+    starts = next_[clip(targets, 0, size - 1)]
+    invalid = (targets < 0) | (targets > size - 1) | (starts >= size)
+    return starts, invalid
 
 
 def get_stock_data(args, key):
     """
-    Get data for a given stock
+    Get data for a given stock as an array of daily prices with NaN for days
+    the stock did not trade
     """
-    def stock_data(key):
-        logger.info("Downloading price data for {}".format(key))
-        # XXX DONT HARDCODE 2013
-        return robjects.r["get.quotes"](
-            key, NEW_YEARS_2013, today, "AdjClose", retclass="ts"
-        )
-
     mapping = {"get_sp500": key, "get_financial_pages": "SPY"}
     
     try:
         key = mapping[args.pages.__name__]
     except (AttributeError, KeyError):
-        prices = stock_data(key)
-    else:
-        prices = stock_data(key)
+        pass
+
+    return get_price_source(args).load(key, args.start, args.end)
 
-    return list(robjects.r["as.data.frame"](prices)[0])
+
+def get_log_prices(prices):
+    """
+    Take the log of a price series, carrying the last price forward over days
+    without one. Days before the first price are NaN
+    """
+    prices = asarray(prices, dtype=float64)
+    previous, _ = get_valid_indices(prices)
+    filled = where(previous >= 0, prices[maximum(previous, 0)], nan)
+    return log(filled)
+
+
+def get_valid_indices(prices):
+    """
+    Build two arrays holding, for every day of a price series, the index of
+    the closest day at or before it and at or after it with a price. Days that
+    have no such neighbour are marked with -1 and len(prices) respectively.
+    """
+    prices = asarray(prices, dtype=float64)
+    size = len(prices)
+    positions = arange(size)
+    valid = ~isnan(prices)
+    previous = maximum.accumulate(where(valid, positions, -1))
+    next_ = minimum.accumulate(where(valid, positions, size)[::-1])[::-1]
+    return previous, next_
 
 
 def load_r_funcs():
     """
     Load necessary R functions
     """
+    from rpy2 import robjects
+
     rfile_dir = realpath(dirname(__file__))
     rfile_path = join(rfile_dir, "stocks.r")
     robjects.r("""source('{}'); getClasses()""".format(rfile_path))
 
 
-def make_plot(pre, post):
+def make_plot(pre, post, output=None):
     """
-    Plot the pre return values and post return values
+    Plot the pre return values and post return values. If an output path is
+    given the plot is written to it and we return instead of waiting for the
+    user. .png, .svg and .pdf paths are rendered by R, .csv and .npz paths
+    get the plotted data.
     """
     data = make_returns_data(pre, post)
+    extension = splitext(output)[1].lstrip(".").lower() if output else None
+    if extension in PLOT_DATA_FORMATS:
+        write_returns_data(data, output, extension)
+        return
+
+    # Importing rpy2 starts R so only do it once we know we need to plot
+    from rpy2 import robjects
+    from rpy2.robjects import numpy2ri
+
+    if extension:
+        robjects.r[PLOT_DEVICES[extension]](file=output)
     numpy2ri.activate()
     column = robjects.r["c"]
     sequence = robjects.r["seq"]
@@ -152,6 +286,50 @@ def make_plot(pre, post):
         x=sequence(0, len(data["pre"]) - 1), y=data["post"], col="blue", pch=19
     )
     robjects.r["abline"](h=0)
+    if extension:
+        robjects.r["dev.off"]()
+        return
+
+    signal.signal(signal.SIGINT, lambda a, b: sys.exit(0))
+    signal.pause()
+
+
+def make_curve_plot(offsets, mean, low, high, output=None):
+    """
+    Plot the average cumulative abnormal return of our events at every day
+    offset along with its confidence band. Outputs are handled like they are
+    by make_plot
+    """
+    data = {"offset": offsets, "mean": mean, "low": low, "high": high}
+    extension = splitext(output)[1].lstrip(".").lower() if output else None
+    if extension in PLOT_DATA_FORMATS:
+        write_curve_data(data, output, extension)
+        return
+
+    from rpy2 import robjects
+    from rpy2.robjects import numpy2ri
+
+    if extension:
+        robjects.r[PLOT_DEVICES[extension]](file=output)
+    numpy2ri.activate()
+    column = robjects.r["c"]
+    bounds = concatenate((low, high))
+    bounds = bounds[~isnan(bounds)] if (~isnan(bounds)).any() else [-1, 1]
+    robjects.r["plot"](
+        x=offsets,
+        y=mean,
+        type="l",
+        ylim=column(min(bounds), max(bounds)),
+        xlab="Days from event",
+        ylab="Cumulative abnormal return"
+    )
+    robjects.r["lines"](x=offsets, y=low, lty=2, col="blue")
+    robjects.r["lines"](x=offsets, y=high, lty=2, col="blue")
+    robjects.r["abline"](h=0, v=0)
+    if extension:
+        robjects.r["dev.off"]()
+        return
+
     signal.signal(signal.SIGINT, lambda a, b: sys.exit(0))
     signal.pause()
 
@@ -160,14 +338,39 @@ def make_returns_data(pre, post):
     """
     Get all data we will need to make our graph
     """
-    max_ = max([max(pre), max(post)])
-    min_ = min([min(pre), min(post)])
-    rets = sorted(
-        zip(pre, post), 
-        key=lambda x: 
-        ((x[0] > 0 and x[1] < 0) or (x[0] < 0 and x[1] > 0)) and x[0] - x[1]
-    )
-    pre, post = zip(*rets)
-    pre = asarray(pre)
-    post = asarray(post)
-    return {"pre": pre, "post": post, "max": max_, "min": min_}
+    pre = asarray(pre, dtype=float64)
+    post = asarray(post, dtype=float64)
+    max_ = max(pre.max(), post.max())
+    min_ = min(pre.min(), post.min())
+    # Events without an inflection sort as 0, inflections by pre - post
+    key = where(sign_flips(pre, post), pre - post, 0)
+    order = argsort(key, kind="mergesort")
+    return {"pre": pre[order], "post": post[order], "max": max_, "min": min_}
+
+
+def write_returns_data(data, path, extension):
+    """
+    Write the sorted pre and post returns of our graph to a csv or npz file
+    """
+    if extension == "npz":
+        savez(path, pre=data["pre"], post=data["post"])
+    else:
+        savetxt(
+            path, column_stack((data["pre"], data["post"])), delimiter=",",
+            header="pre,post", comments=""
+        )
+
+
+def write_curve_data(data, path, extension):
+    """
+    Write the average curve and confidence band of our events to a csv or npz
+    file
+    """
+    columns = ("offset", "mean", "low", "high")
+    if extension == "npz":
+        savez(path, **{column: data[column] for column in columns})
+    else:
+        savetxt(
+            path, column_stack([data[column] for column in columns]),
+            delimiter=",", header=",".join(columns), comments=""
+        )
@@ -6,6 +6,43 @@ from logging import getLogger
 from logging.config import dictConfig
 
 analysis_interval = 14
+# Returns subtracted from event study returns, SPY or "equal" for an equal
+# weighted index of the analyzed stocks
+benchmark = "SPY"
+fetch_workers = 8
+processes = 1
+# Random event days drawn per stock for RANDOM runs and baselines
+random_views = 8
+# Number of resamples used for significance tests
+resamples = 10000
+# Max requests per second sent to a single host
+rate_limit = 10
+# Seconds to wait for a server, and times a failed request is retried with
+# exponential backoff starting at http_backoff seconds
+http_timeout = 10
+http_retries = 3
+http_backoff = .5
+# Failed page view downloads after which we stop fetching pages
+max_failures = 50
+cache_dir = "~/.discerner"
+price_source = "r"
+# Symbol columns the price store makes room for at a time
+store_capacity = 512
+# Find outliers against the quantile of all views or of a rolling window
+detector = "global"
+# Days of page views the rolling outlier threshold is computed over
+quantile_window = 365
+# Days of page views needed before a rolling threshold is trusted
+quantile_min_periods = 60
+# Pages whose rolling outliers are detected in a single vectorized call
+rolling_block = 512
+# Address discerner.server listens on, only reachable from this machine
+server_host = "127.0.0.1"
+server_port = 8765
+# Hours before we check a cached page for new views
+cache_ttl = 12
+# Days a cached page can go unused before it is evicted
+cache_max_age = 30
 
 log_config = {
     "version": 1,
@@ -0,0 +1,104 @@
+"""
+discerner.export
+~~~~~~~~~~~~~~~~
+"""
+import json
+import os
+from os.path import exists, expanduser, join
+import struct
+
+from numpy import asarray, dtype as make_dtype, int32
+from numpy.lib.format import magic
+
+from discerner.cache import write_atomic
+from discerner.results import EventResults
+
+# Bytes reserved for the header of every .npy file so it can be rewritten
+# with the final number of rows once all events are written
+NPY_HEADER_SIZE = 128
+
+
+def npy_header(dtype, rows):
+    """
+    Build a version 1.0 .npy header for a 1D array of rows dtype values,
+    padded to NPY_HEADER_SIZE bytes
+    """
+    prefix = magic(1, 0)
+    header = "{{'descr': {!r}, 'fortran_order': False, 'shape': ({},), }}"
+    header = header.format(str(dtype.str), rows)
+    header = header.ljust(NPY_HEADER_SIZE - len(prefix) - 3) + "\n"
+    return prefix + struct.pack("<H", len(header)) + header
+
+
+class EventExporter(object):
+    """
+    Stream evaluated events into a directory holding one .npy file per
+    EventResults column, which can be loaded memory mapped with
+    numpy.load(path, mmap_mode="r"). Symbols are stored as codes into the
+    list of {"symbol", "page"} records of categories.json
+    """
+    def __init__(self, directory):
+        self.directory = expanduser(directory)
+        if not exists(self.directory):
+            os.makedirs(self.directory)
+        self.dtypes = {
+            column: make_dtype(dtype)
+            for column, dtype in EventResults.columns.iteritems()
+        }
+        self.files = {}
+        for column, dtype in self.dtypes.iteritems():
+            file_ = open(join(self.directory, "{}.npy".format(column)), "wb")
+            file_.write(npy_header(dtype, 0))
+            self.files[column] = file_
+        self.rows = 0
+        self.categories = []
+        self.symbol_codes = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def symbol_code(self, symbol, page):
+        if symbol not in self.symbol_codes:
+            self.symbol_codes[symbol] = len(self.categories)
+            self.categories.append({"symbol": symbol, "page": page})
+        return self.symbol_codes[symbol]
+
+    def write(self, results):
+        """
+        Append all events of an EventResults object to our files
+        """
+        with results.lock:
+            symbols = list(results.symbols)
+            chunks = list(results.chunks)
+            pages = dict(results.pages)
+
+        codes = asarray(
+            [
+                self.symbol_code(symbol, pages.get(symbol))
+                for symbol in symbols
+            ],
+            dtype=int32
+        )
+        for chunk in chunks:
+            chunk = dict(chunk, symbol=codes[chunk["symbol"]])
+            for column, file_ in self.files.iteritems():
+                values = asarray(chunk[column], dtype=self.dtypes[column])
+                file_.write(values.tobytes())
+            self.rows += len(chunk["symbol"])
+
+    def close(self):
+        """
+        Write the final headers and our categories
+        """
+        for column, file_ in self.files.iteritems():
+            file_.seek(0)
+            file_.write(npy_header(self.dtypes[column], self.rows))
+            file_.close()
+        self.files = {}
+        write_atomic(
+            join(self.directory, "categories.json"), json.dump,
+            self.categories
+        )
@@ -0,0 +1,111 @@
+"""
+discerner.fetcher
+~~~~~~~~~~~~~~~~~
+"""
+from threading import Lock
+from time import sleep, time
+
+from memorandum.exceptions import HTTPStatusCodeError
+from memorandum.finder import get_yearly_data
+from requests.exceptions import RequestException
+
+from discerner.cache import PageViewCache, views_in_range
+from discerner.constants import PAGE_VIEWS_HOST
+from discerner.defaults import logger
+from discerner.metrics import metrics
+from discerner.network import FailureBudget, call_with_retries
+from discerner.pipeline import map_threaded
+from discerner.utils import to_datetime
+
+_caches = {}
+
+
+class RateLimiter(object):
+    """
+    Space out requests made against the same host so that, across all worker
+    threads, no host is hit more than `rate` times a second
+    """
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self.lock = Lock()
+        self.next_slot = {}
+
+    def wait(self, host):
+        """
+        Block until the calling thread is allowed to make a request to host
+        """
+        with self.lock:
+            now = time()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
+
+        delay = slot - time()
+        if delay > 0:
+            sleep(delay)
+
+
+def fetch_page_views(args, pages):
+    """
+    Concurrently fetch yearly page view data for an iterable of (symbol, page)
+    pairs, keeping the days within our start and end dates. Yields tuples of
+    (symbol, page, data) in the order the downloads complete. data is None if
+    the page could not be fetched, even after retrying, or if more than
+    args.max_failures pages have failed already
+    """
+    limiter = RateLimiter(args.rate_limit)
+    budget = FailureBudget(args.max_failures)
+    cache = get_page_view_cache(args)
+    start, end = to_datetime(args.start), to_datetime(args.end)
+
+    def request(page):
+        limiter.wait(PAGE_VIEWS_HOST)
+        logger.debug("Fetching page views for %s", page)
+        # memorandum does not tell us how many bytes it downloaded
+        metrics.count("page_view_requests")
+        return get_yearly_data(page)
+
+    def download(page):
+        # memorandum makes its own requests so retry around it
+        return call_with_retries(request, (HTTPStatusCodeError,), page)
+
+    def fetch(item):
+        key, page = item
+        if budget.exhausted():
+            logger.warn("Too many failed downloads, not fetching {}".format(
+                page
+            ))
+            return key, page, None
+        try:
+            with metrics.timer("fetch_views", key):
+                if cache:
+                    data = cache.get(page, download, start, end)
+                else:
+                    data = views_in_range(download(page), start, end)
+        except (RequestException, HTTPStatusCodeError) as error:
+            budget.fail()
+            metrics.count("failed_pages")
+            logger.warn("Could not fetch views of {}: {}".format(page, error))
+            data = None
+        return key, page, data
+
+    return map_threaded(fetch, pages, args.workers)
+
+
+def get_page_view_cache(args):
+    """
+    Return the page view cache to use for this run, None if caching is off.
+    Caches are only created, and evicted from, once per process so that
+    their pages stay in memory between runs
+    """
+    if args.no_cache:
+        return None
+    key = (args.cache_dir, args.cache_ttl, args.cache_max_age)
+    if key not in _caches:
+        cache = PageViewCache(
+            args.cache_dir,
+            ttl=args.cache_ttl * 60 * 60,
+            max_age=args.cache_max_age * 24 * 60 * 60
+        )
+        cache.evict()
+        _caches[key] = cache
+    return _caches[key]
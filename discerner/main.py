@@ -3,19 +3,81 @@ discerner.main
 ~~~~~~~~~~~~~~
 """
 #!/usr/bin/env python
-from argparse import ArgumentParser
+from argparse import ArgumentParser, ArgumentTypeError
+from os.path import splitext
+import sys
 
-from discerner.analyze import (
-    analyze_pages, for_historical_views, for_recent_views, for_random_views
+from discerner.constants import (
+    DAYS, NEW_YEARS_2013, PLOT_DATA_FORMATS, PLOT_DEVICES
+)
+from discerner.defaults import (
+    analysis_interval, benchmark, cache_dir, cache_max_age, cache_ttl,
+    detector, fetch_workers, http_retries, http_timeout, max_failures,
+    price_source, processes, quantile_min_periods, quantile_window,
+    random_views, rate_limit, resamples, server_host
 )
-from discerner.constants import DAYS
-from discerner.defaults import analysis_interval
 from discerner.pages import get_financial_pages, get_sp500
+from discerner.utils import to_datetime, today
+
+
+def comma_separated(type_):
+    """
+    Make an argparse type that parses a comma separated list of type_ values
+    """
+    def parse(string):
+        try:
+            return [type_(value) for value in string.split(",")]
+        except ValueError:
+            raise ArgumentTypeError("invalid list: {}".format(string))
+    return parse
+
+
+def positive_int(string):
+    """
+    argparse type for integers of at least 1
+    """
+    value = int(string)
+    if value < 1:
+        raise ArgumentTypeError("not a positive integer: {}".format(string))
+    return value
 
 
-def parse_argv():
+def date(string):
     """
-    Parse argv for which pages we wish to analyze
+    argparse type for "%Y-%m-%d" dates
+    """
+    try:
+        to_datetime(string)
+    except ValueError:
+        raise ArgumentTypeError("invalid date: {}".format(string))
+    return string
+
+
+def address(string):
+    """
+    argparse type for HOST:PORT server addresses, HOST defaults to localhost
+    """
+    host, _, port = string.rpartition(":")
+    try:
+        port = int(port)
+    except ValueError:
+        raise ArgumentTypeError("invalid HOST:PORT: {}".format(string))
+    return host or server_host, port
+
+
+def plot_output(path):
+    """
+    argparse type for paths we can write plots or plot data to
+    """
+    extension = splitext(path)[1].lstrip(".").lower()
+    if extension not in PLOT_DATA_FORMATS and extension not in PLOT_DEVICES:
+        raise ArgumentTypeError("unsupported plot format: {}".format(path))
+    return path
+
+
+def parse_argv(argv=None):
+    """
+    Parse argv, sys.argv by default, for which pages we wish to analyze
     """
     parser = ArgumentParser()
     parser.add_argument(
@@ -28,9 +90,10 @@ def parse_argv():
     parser.add_argument(
         "-p", 
         "--probability", 
-        type=float,
-        default=.9,
-        help="The percentile of page views to view for eg: .88"
+        type=comma_separated(float),
+        default=[.9],
+        help="Comma separated percentiles of page views to view for, eg: "
+        ".88. Several HISTORICAL percentiles are swept over in a single run"
     )
     parser.add_argument(
         "-t",
@@ -42,12 +105,227 @@ def parse_argv():
     parser.add_argument(
         "-i", 
         "--interval", 
+        type=comma_separated(positive_int),
+        default=[analysis_interval],
+        help="Comma separated intervals to analyze data over (days), eg: 5,14"
+    )
+    parser.add_argument(
+        "--baseline",
+        action="store_true",
+        help="Compare HISTORICAL events against random days of the same stocks"
+    )
+    parser.add_argument(
+        "--random-views",
+        type=int,
+        default=random_views,
+        help="Number of random event days to draw per stock"
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        help="Seed for random event days and resampling"
+    )
+    parser.add_argument(
+        "--resamples",
+        type=int,
+        default=resamples,
+        help="Number of resamples for bootstrap and permutation tests"
+    )
+    parser.add_argument(
+        "-o",
+        "--plot-output",
+        type=plot_output,
+        help="Write the plot to a .png, .svg or .pdf file, or its data to a "
+        ".csv or .npz file, instead of showing it. Several intervals get one "
+        "file each, eg: returns_14.png"
+    )
+    parser.add_argument(
+        "--no-plot",
+        action="store_true",
+        help="Only print statistics, without showing or writing a plot"
+    )
+    parser.add_argument(
+        "--event-study",
+        action="store_true",
+        help="Plot the average cumulative abnormal return from the longest "
+        "interval before HISTORICAL events to the longest interval after "
+        "them instead of pre and post returns"
+    )
+    parser.add_argument(
+        "--benchmark",
+        choices=["SPY", "equal"],
+        default=benchmark,
+        help="Subtract the returns of SPY or of an equal weighted index of "
+        "all analyzed stocks for --event-study"
+    )
+    parser.add_argument(
+        "--export",
+        metavar="DIR",
+        help="Write every evaluated event to DIR as one .npy file per column"
+    )
+    parser.add_argument(
+        "--watch",
+        type=float,
+        metavar="SECONDS",
+        help="Keep polling for RECENT outliers every SECONDS seconds"
+    )
+    parser.add_argument(
+        "--detector",
+        choices=["global", "rolling"],
+        default=detector,
+        help="Compare page views against the quantile of all views or of a "
+        "rolling --window of days"
+    )
+    parser.add_argument(
+        "--window",
+        type=int,
+        default=quantile_window,
+        help="Number of days of page views rolling and --watch outlier "
+        "thresholds are computed over"
+    )
+    parser.add_argument(
+        "--min-periods",
         type=int,
-        default=analysis_interval,
-        help="Interval to analyze data over (days)"
+        default=quantile_min_periods,
+        help="Number of days of page views needed before rolling and "
+        "--watch outliers are reported"
+    )
+    parser.add_argument(
+        "--start",
+        type=date,
+        default=NEW_YEARS_2013,
+        help="First day to analyze, eg: 2010-01-01. Prices cover the whole "
+        "range but page views only go back one year from today"
+    )
+    parser.add_argument(
+        "--end",
+        type=date,
+        default=today(),
+        help="Last day to analyze, eg: 2014-12-31"
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=fetch_workers,
+        help="Number of pages to download views for concurrently"
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=processes,
+        help="Number of processes to analyze symbols in"
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=float,
+        default=rate_limit,
+        help="Max number of requests per second to send to a single host"
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=http_timeout,
+        help="Seconds to wait for a server before giving up on a request"
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=http_retries,
+        help="Number of times failed requests are retried with exponential "
+        "backoff"
+    )
+    parser.add_argument(
+        "--max-failures",
+        type=int,
+        default=max_failures,
+        help="Stop fetching page views after this many pages failed"
+    )
+    parser.add_argument(
+        "--metrics",
+        action="store_true",
+        help="Log the time spent in every stage along with cache and "
+        "download counters at the end of a run"
+    )
+    parser.add_argument(
+        "--metrics-output",
+        help="Also write the metrics of every stage and symbol to this json "
+        "file"
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=cache_dir,
+        help="Directory to cache downloaded data in"
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=cache_ttl,
+        help="Hours before cached data is checked for new days"
+    )
+    parser.add_argument(
+        "--cache-max-age",
+        type=float,
+        default=cache_max_age,
+        help="Days cached data can go unused before it is evicted"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always download fresh data"
+    )
+    parser.add_argument(
+        "--price-source",
+        choices=["r", "csv", "http"],
+        default=price_source,
+        help="Where to load stock prices from"
+    )
+    parser.add_argument(
+        "--price-store",
+        action="store_true",
+        help="Cache prices of all stocks in one memory mapped matrix instead "
+        "of a file per stock"
+    )
+    parser.add_argument(
+        "--price-dir",
+        help="Directory of <SYMBOL>.csv price files for the csv price source"
+    )
+    parser.add_argument(
+        "--price-url",
+        help="Base url of <SYMBOL>.csv price files for the http price source"
+    )
+    parser.add_argument(
+        "--connect",
+        type=address,
+        metavar="HOST:PORT",
+        help="Run the query on a discerner server started with python -m "
+        "discerner.server, which keeps page views and prices in memory"
     )
     add_subparsers(parser)
-    return parser.parse_args()
+    args = parser.parse_args(argv)
+    if args.start > args.end:
+        parser.error("--start must not be after --end")
+    if args.random_views < 0:
+        parser.error("--random-views must not be negative")
+    if args.baseline and args.random_views < 1:
+        parser.error("--baseline needs at least one random view")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.rate_limit < 0:
+        parser.error("--rate-limit must not be negative")
+    if not 1 <= args.min_periods <= args.window:
+        parser.error("--min-periods must be between 1 and --window")
+    if args.watch is not None and args.watch <= 0:
+        parser.error("--watch needs a positive number of seconds")
+    if args.watch and args.data_type != "RECENT":
+        parser.error("--watch only supports RECENT data")
+    if args.event_study and args.data_type != "HISTORICAL":
+        parser.error("--event-study only supports HISTORICAL data")
+    if args.watch and len(args.probability) > 1:
+        parser.error("--watch only supports a single probability")
+    if args.watch and args.connect:
+        parser.error("--watch can not be run on a server")
+    return args
 
 
 def add_subparsers(parser):
@@ -97,6 +375,33 @@ def main():
     Discerner console script
     """
     args = parse_argv()
+    if args.connect:
+        from discerner.server import query
+        sys.exit(query(args.connect, sys.argv[1:], args.cache_dir))
+    run(args)
+
+
+def run(args):
+    """
+    Run the analysis or watch selected by args
+    """
+    from discerner.metrics import metrics
+    from discerner.network import configure
+    configure(args)
+    metrics.reset()
+    metrics.enabled = args.metrics or bool(args.metrics_output)
+    if args.watch:
+        from discerner.watch import watch_pages
+        watch_pages(args)
+        return
+
+    # Importing the analysis pulls in numpy, memorandum and friends so wait
+    # until we know we are going to run one
+    from discerner.analyze import (
+        analyze_pages, for_historical_views, for_recent_views,
+        for_random_views
+    )
+
     mapping = {
         "RANDOM": for_random_views,
         "RECENT": for_recent_views, 
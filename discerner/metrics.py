@@ -0,0 +1,134 @@
+"""
+discerner.metrics
+~~~~~~~~~~~~~~~~~
+"""
+from collections import defaultdict
+import json
+from threading import Lock
+from time import time
+
+from discerner.defaults import logger
+
+
+class Metrics(object):
+    """
+    Wall time and call counts of pipeline stages along with counters such as
+    bytes fetched or cache hits, both in total and per symbol. Disabled
+    metrics record nothing, so instrumented code only pays for a method call
+    """
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.lock = Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.stages = defaultdict(lambda: {"calls": 0, "seconds": 0.0})
+            self.counters = defaultdict(int)
+            self.symbols = defaultdict(lambda: defaultdict(float))
+
+    def timer(self, stage, symbol=None):
+        """
+        Context manager adding the time spent in its block to stage
+        """
+        if not self.enabled:
+            return _null_timer
+        return Timer(self, stage, symbol)
+
+    def add_time(self, stage, seconds, symbol=None):
+        with self.lock:
+            self.stages[stage]["calls"] += 1
+            self.stages[stage]["seconds"] += seconds
+            if symbol is not None:
+                self.symbols[symbol]["{}_seconds".format(stage)] += seconds
+
+    def count(self, name, value=1, symbol=None):
+        """
+        Add value to the counter name
+        """
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] += value
+            if symbol is not None:
+                self.symbols[symbol][name] += value
+
+    def snapshot(self):
+        """
+        Return everything recorded so far as plain dicts
+        """
+        with self.lock:
+            return {
+                "stages": {
+                    stage: dict(values)
+                    for stage, values in self.stages.iteritems()
+                },
+                "counters": dict(self.counters),
+                "symbols": {
+                    symbol: dict(values)
+                    for symbol, values in self.symbols.iteritems()
+                },
+            }
+
+    def merge(self, snapshot):
+        """
+        Add a snapshot taken in another process to our metrics
+        """
+        with self.lock:
+            for stage, values in snapshot["stages"].iteritems():
+                self.stages[stage]["calls"] += values["calls"]
+                self.stages[stage]["seconds"] += values["seconds"]
+            for name, value in snapshot["counters"].iteritems():
+                self.counters[name] += value
+            for symbol, values in snapshot["symbols"].iteritems():
+                for name, value in values.iteritems():
+                    self.symbols[symbol][name] += value
+
+    def report(self, path=None):
+        """
+        Log a summary of our stages and counters, writing everything we
+        recorded to path as json if one is given
+        """
+        snapshot = self.snapshot()
+        stages = sorted(
+            snapshot["stages"].iteritems(),
+            key=lambda item: -item[1]["seconds"]
+        )
+        for stage, values in stages:
+            logger.info(
+                "Stage %s: %.3fs over %d calls", stage, values["seconds"],
+                values["calls"]
+            )
+        for name, value in sorted(snapshot["counters"].iteritems()):
+            logger.info("Counter %s: %s", name, value)
+        if path:
+            with open(path, "w") as file_:
+                json.dump(snapshot, file_, indent=4, sort_keys=True)
+            logger.info("Wrote metrics to %s", path)
+
+
+class Timer(object):
+    def __init__(self, metrics, stage, symbol):
+        self.metrics = metrics
+        self.stage = stage
+        self.symbol = symbol
+
+    def __enter__(self):
+        self.started = time()
+
+    def __exit__(self, *exc_info):
+        self.metrics.add_time(self.stage, time() - self.started, self.symbol)
+
+
+class NullTimer(object):
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_null_timer = NullTimer()
+
+# Metrics of this process, enabled with --metrics
+metrics = Metrics()
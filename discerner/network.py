@@ -0,0 +1,140 @@
+"""
+discerner.network
+~~~~~~~~~~~~~~~~~
+"""
+import re
+from threading import Lock
+from time import sleep
+
+from requests import Session
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError, Timeout
+from requests.packages.urllib3.util.retry import Retry
+
+from discerner.defaults import (
+    fetch_workers, http_backoff, http_retries, http_timeout, logger
+)
+from discerner.metrics import metrics
+
+# Server side errors that are worth trying again
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+STATUS_PATTERN = re.compile(r"\b[45]\d\d\b")
+
+_lock = Lock()
+_settings = {
+    "timeout": http_timeout,
+    "retries": http_retries,
+    "backoff": http_backoff,
+    "pool_size": fetch_workers,
+}
+_session = None
+
+
+def configure(args):
+    """
+    Use the timeout, retries and number of workers given on the command line
+    for every request made from now on
+    """
+    global _session
+    settings = dict(
+        _settings, timeout=args.timeout, retries=args.retries,
+        pool_size=args.workers
+    )
+    with _lock:
+        if settings != _settings:
+            _settings.update(settings)
+            # Keep our pooled connections unless the session has to change
+            _session = None
+
+
+def get_session():
+    """
+    Return the requests session shared by all threads. Its connections are
+    kept alive and pooled per host, and failed requests are retried with
+    exponential backoff
+    """
+    global _session
+    with _lock:
+        if _session is None:
+            _session = make_session(**_settings)
+        return _session
+
+
+def make_session(timeout, retries, backoff, pool_size):
+    session = Session()
+    retry = Retry(
+        total=retries, backoff_factor=backoff, status_forcelist=RETRY_STATUSES
+    )
+    adapter = HTTPAdapter(pool_maxsize=pool_size, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get(url, **kwargs):
+    """
+    GET url through our shared session using our timeout. Only these
+    requests count towards session_bytes_fetched, memorandum downloads its
+    page views itself
+    """
+    kwargs.setdefault("timeout", _settings["timeout"])
+    response = get_session().get(url, **kwargs)
+    metrics.count("session_bytes_fetched", len(response.content))
+    return response
+
+
+def call_with_retries(func, errors, *args):
+    """
+    Call func with args, retrying with exponential backoff when it raises one
+    of errors. Errors with an http status are only retried for statuses in
+    RETRY_STATUSES, so missing pages fail at once. This is for libraries
+    that make requests without our session
+    """
+    errors = (ConnectionError, Timeout) + errors
+    retries, backoff = _settings["retries"], _settings["backoff"]
+    for attempt in xrange(retries + 1):
+        try:
+            return func(*args)
+        except errors as error:
+            status = get_status(error)
+            if attempt == retries or status not in (None,) + RETRY_STATUSES:
+                raise
+            delay = backoff * 2 ** attempt
+            logger.debug("%s, retrying in %s seconds", error, delay)
+            sleep(delay)
+
+
+def get_status(error):
+    """
+    Return the http status code an error was raised for, None if it was not
+    raised for one. Libraries without a status attribute are expected to
+    mention the status in their message
+    """
+    response = getattr(error, "response", None)
+    for status in (
+        getattr(error, "status_code", None),
+        getattr(response, "status_code", None),
+    ):
+        if status is not None:
+            return int(status)
+    match = STATUS_PATTERN.search(str(error))
+    return int(match.group()) if match else None
+
+
+class FailureBudget(object):
+    """
+    Count failed requests so that a run can stop hammering a host that is
+    down once more than `budget` of them have failed. No budget never runs
+    out
+    """
+    def __init__(self, budget):
+        self.budget = budget
+        self.failures = 0
+        self.lock = Lock()
+
+    def fail(self):
+        with self.lock:
+            self.failures += 1
+
+    def exhausted(self):
+        return self.budget is not None and self.failures >= self.budget
@@ -2,15 +2,18 @@
 discerner.pages
 ~~~~~~~~~~~~~~~
 """
+from argparse import Namespace
+from imp import find_module
+import json
+from os.path import join
 import re
-
-from bs4 import BeautifulSoup
-import requests
+from time import time
 
 from discerner.constants import SP500_TABLE_CLASS, SP500_URL
+from discerner.defaults import cache_dir, cache_ttl, logger
 
 
-def get_financial_pages():
+def get_financial_pages(args=None):
     """
     Get all relevant financial pages
     """
@@ -79,36 +82,93 @@ def get_financial_pages():
     }
 
 
-def get_sp500():
+def get_sp500(args=None):
+    """
+    Get ticker symbol and wiki url suffix for all companies on S&P 500 index.
+    The list is kept in our cache directory and once it is older than our ttl
+    we only download it again if wikipedia reports that it has changed.
+    """
+    from requests.exceptions import RequestException
+    from discerner import network
+    from discerner.cache import make_cache_dir, write_atomic
+
+    if args is None:
+        args = Namespace(
+            cache_dir=cache_dir, cache_ttl=cache_ttl, no_cache=False
+        )
+    if args.no_cache:
+        response = network.get(SP500_URL)
+        response.raise_for_status()
+        return parse_sp500(response.text)
+
+    path = join(make_cache_dir(args.cache_dir, "pages"), "sp500.json")
+    try:
+        with open(path) as file_:
+            record = json.load(file_)
+    except (IOError, ValueError):
+        record = None
+
+    if record and time() - record["checked"] < args.cache_ttl * 60 * 60:
+        return record["pages"]
+
+    headers = {}
+    if record and record["etag"]:
+        headers["If-None-Match"] = record["etag"]
+    if record and record["last_modified"]:
+        headers["If-Modified-Since"] = record["last_modified"]
+    try:
+        response = network.get(SP500_URL, headers=headers)
+        if response.status_code != 304:
+            response.raise_for_status()
+    except RequestException as error:
+        if not record:
+            raise
+        logger.warn("Using the cached S&P 500 list: {}".format(error))
+        return record["pages"]
+
+    if response.status_code == 304:
+        logger.debug("S&P 500 list has not changed")
+    else:
+        record = {
+            "pages": parse_sp500(response.text),
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+
+    record["checked"] = time()
+    write_atomic(path, json.dump, record)
+    return record["pages"]
+
+
+def get_html_parser():
+    """
+    Use lxml to parse html if it is installed, it is much faster
     """
-    Get ticker symbol and wiki url suffix for all companies on S&P 500 index
+    try:
+        find_module("lxml")
+    except ImportError:
+        return "html.parser"
+    return "lxml"
+
+
+def parse_sp500(html):
     """
-    def parse_company():
-        generator_index = 1
-        for child in company.children:
-            generator_index += 1
-            if child.string:
-                symbol = child.string
-            try:
-                href = child.find_next_sibling().a.get("href")
-            except AttributeError:
-                continue
-            else:
-                href = href if re.search("/wiki", href) else ""
-            if generator_index > 2:
-                break
-        return symbol, href
+    Parse the {symbol: wiki page} mapping out of the S&P 500 list page. Only
+    the constituents table is parsed.
+    """
+    from bs4 import BeautifulSoup, SoupStrainer
 
+    table = SoupStrainer(
+        "table", {"class": re.compile(r"\b{}\b".format(SP500_TABLE_CLASS))}
+    )
+    soup = BeautifulSoup(html, get_html_parser(), parse_only=table)
     sp500 = {}
-    html = requests.get(SP500_URL).text
-    soup = BeautifulSoup(html)
-    companies = soup.find("table", {"class": SP500_TABLE_CLASS}).find_all("tr")
-    for company in companies:
-        symbol, href = parse_company()
-        sp500[symbol] = href.split("/")[-1]
-
-    partial = {company: page for company, page in sp500.iteritems() if page}
-    if "Company" in partial:
-        del partial["Company"]
-
-    return partial
+    for row in soup.find("table").find_all("tr"):
+        cells = row.find_all("td", limit=2)
+        if len(cells) < 2:
+            continue
+        link = cells[1].find("a", href=re.compile("/wiki"))
+        if link:
+            sp500[cells[0].get_text(strip=True)] = link["href"].split("/")[-1]
+
+    return sp500
@@ -0,0 +1,124 @@
+"""
+discerner.pipeline
+~~~~~~~~~~~~~~~~~~
+"""
+from collections import deque
+from Queue import Empty, Full, Queue
+import sys
+from threading import Event, Thread
+# strptime imports this lazily on its first call, which fails if that call
+# happens in several worker threads at once
+import _strptime
+
+_done = object()
+
+
+def map_threaded(func, items, workers, buffer_size=None):
+    """
+    Lazily apply func to items in worker threads, yielding results in the
+    order they complete. At most buffer_size items wait between this stage
+    and its neighbours, so a slow consumer blocks the producer instead of
+    piling results up in memory.
+    """
+    buffer_size = buffer_size or workers * 2
+    inputs = Queue(buffer_size)
+    outputs = Queue(buffer_size)
+    stop = Event()
+
+    def feed():
+        try:
+            for item in items:
+                if not put(inputs, item, stop):
+                    return
+        except Exception:
+            put(outputs, (False, sys.exc_info()[1]), stop)
+        for _ in xrange(workers):
+            put(inputs, _done, stop)
+
+    def work():
+        while True:
+            item = get(inputs, stop)
+            if item is _done:
+                break
+            try:
+                result = (True, func(item))
+            except Exception:
+                result = (False, sys.exc_info()[1])
+            if not put(outputs, result, stop):
+                return
+        put(outputs, (True, _done), stop)
+
+    threads = [Thread(target=feed)]
+    threads.extend(Thread(target=work) for _ in xrange(workers))
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    finished = 0
+    try:
+        while finished < workers:
+            succeeded, value = outputs.get()
+            if not succeeded:
+                raise value
+            elif value is _done:
+                finished += 1
+            else:
+                yield value
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+
+def map_processes(func, items, pool, buffer_size):
+    """
+    Lazily apply func to items in a process pool, keeping at most buffer_size
+    items in flight. Results are yielded in the order items were submitted.
+    """
+    pending = deque()
+    for item in items:
+        pending.append(pool.apply_async(func, (item,)))
+        if len(pending) >= buffer_size:
+            yield pending.popleft().get()
+
+    while pending:
+        yield pending.popleft().get()
+
+
+def batch(items, size):
+    """
+    Lazily group items into lists of at most size items
+    """
+    block = []
+    for item in items:
+        block.append(item)
+        if len(block) == size:
+            yield block
+            block = []
+    if block:
+        yield block
+
+
+def get(queue, stop):
+    """
+    Take an item from queue, returning _done if the pipeline was stopped
+    """
+    while not stop.is_set():
+        try:
+            return queue.get(timeout=.1)
+        except Empty:
+            pass
+    return _done
+
+
+def put(queue, item, stop):
+    """
+    Put an item on queue, returning False if the pipeline was stopped first
+    """
+    while not stop.is_set():
+        try:
+            queue.put(item, timeout=.1)
+            return True
+        except Full:
+            pass
+    return False
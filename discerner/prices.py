@@ -0,0 +1,118 @@
+"""
+discerner.prices
+~~~~~~~~~~~~~~~~
+"""
+import csv
+from os.path import expanduser, join
+
+from numpy import asarray, concatenate, float64, full, nan
+
+from discerner import network
+from discerner.cache import PriceCache
+from discerner.constants import PRICE_CSV_COLUMN, PRICE_CSV_DATE_COLUMN
+from discerner.defaults import logger
+from discerner.store import PriceStore
+from discerner.utils import days_between
+
+# Errors raised by price sources for symbols they cannot load. Failed
+# requests are IOErrors too
+PRICE_ERRORS = (IOError, ValueError)
+
+_sources = {}
+
+
+def parse_price_csv(lines, start, end):
+    """
+    Parse csv price data into an array holding one price per calendar day from
+    start to end. Days without a price are NaN.
+    """
+    prices = full(days_between(start, end) + 1, nan, dtype=float64)
+    for row in csv.DictReader(lines):
+        day = days_between(start, row[PRICE_CSV_DATE_COLUMN])
+        if 0 <= day < len(prices):
+            prices[day] = float(row[PRICE_CSV_COLUMN])
+    return prices
+
+
+class CSVSource(object):
+    """
+    Read prices from a directory holding one <SYMBOL>.csv file per stock
+    """
+    def __init__(self, directory):
+        self.directory = expanduser(directory)
+
+    def load(self, symbol, start, end):
+        logger.info("Reading price data for {}".format(symbol))
+        with open(join(self.directory, "{}.csv".format(symbol))) as file_:
+            return parse_price_csv(file_, start, end)
+
+
+class HTTPSource(object):
+    """
+    Download prices from a server that hosts one <SYMBOL>.csv file per stock
+    """
+    def __init__(self, url):
+        self.url = url.rstrip("/")
+
+    def load(self, symbol, start, end):
+        logger.info("Downloading price data for {}".format(symbol))
+        response = network.get("{}/{}.csv".format(self.url, symbol))
+        response.raise_for_status()
+        return parse_price_csv(response.text.splitlines(), start, end)
+
+
+class RSource(object):
+    """
+    Download prices through the get.quotes function of stocks.r
+    """
+    def __init__(self):
+        from discerner.cruncher import load_r_funcs
+        from rpy2 import robjects
+        from rpy2.rinterface import RRuntimeError
+
+        self.robjects = robjects
+        self.error = RRuntimeError
+        load_r_funcs()
+
+    def load(self, symbol, start, end):
+        logger.info("Downloading price data for {}".format(symbol))
+        r = self.robjects.r
+        try:
+            series = r["get.quotes"](
+                symbol, start, end, "AdjClose", retclass="ts"
+            )
+        except self.error as error:
+            raise IOError("get.quotes failed for {}: {}".format(
+                symbol, error
+            ))
+        # R's NA is stored as a NaN so the column converts without a copy
+        prices = asarray(r["as.data.frame"](series)[0], dtype=float64)
+        # The series begins at the first day with a quote which is not
+        # necessarily start. Pad it so that index 0 is always start.
+        offset = int(r["start"](series)[0]) - days_between("1970-01-01", start)
+        return concatenate((full(max(offset, 0), nan, dtype=float64), prices))
+
+
+def get_price_source(args):
+    """
+    Return the price source selected on the command line, wrapped in a price
+    cache or the price store unless caching is off. Sources are only created
+    once per process.
+    """
+    mapping = {
+        "csv": lambda: CSVSource(args.price_dir),
+        "http": lambda: HTTPSource(args.price_url),
+        "r": RSource,
+    }
+    key = (
+        args.price_source, args.price_dir, args.price_url, args.no_cache,
+        args.cache_dir, args.price_store
+    )
+    if key not in _sources:
+        source = mapping[args.price_source]()
+        if args.price_store and not args.no_cache:
+            source = PriceStore(source, args.cache_dir)
+        elif not args.no_cache:
+            source = PriceCache(source, args.cache_dir)
+        _sources[key] = source
+    return _sources[key]
@@ -0,0 +1,221 @@
+"""
+discerner.results
+~~~~~~~~~~~~~~~~~
+"""
+from threading import Lock
+
+from numpy import (
+    arange, asarray, bool_, broadcast_to, concatenate, empty, float64, full,
+    int32, lexsort, nan
+)
+
+
+class EventResults(object):
+    """
+    Array backed store of evaluated events with a symbol, event date,
+    interval, pre return and post return column. The random column flags
+    events drawn on random days rather than on page view outliers, while the
+    views and quantile columns hold the page views that made a day an
+    outlier and the threshold they beat at the probability of the
+    probability column (NaN for random days). Workers append whole chunks of
+    events at a time from any thread, and results built in other threads or
+    processes can be merged in. Event studies also keep a cumulative return
+    curve per outlier event in separate curve chunks.
+    """
+    columns = {
+        "symbol": int32,
+        "date": "datetime64[D]",
+        "interval": int32,
+        "pre": float64,
+        "post": float64,
+        "random": bool_,
+        "views": float64,
+        "quantile": float64,
+        "probability": float64,
+    }
+
+    def __init__(self):
+        self.symbols = []
+        self.symbol_codes = {}
+        # The wikipedia page every symbol's views were taken from
+        self.pages = {}
+        self.chunks = []
+        self.curve_chunks = []
+        self.lock = Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = Lock()
+
+    def __len__(self):
+        with self.lock:
+            return sum(len(chunk["pre"]) for chunk in self.chunks)
+
+    def sort(self):
+        """
+        Order events by symbol, probability, interval and date so that our
+        results do not depend on the order symbols were analyzed in
+        """
+        with self.lock:
+            chunk = self.compact()
+            order = sorted(
+                range(len(self.symbols)), key=self.symbols.__getitem__
+            )
+            ranks = empty(len(order), dtype=int32)
+            ranks[order] = arange(len(order), dtype=int32)
+            codes = ranks[chunk["symbol"]]
+            rows = lexsort((
+                chunk["date"], chunk["interval"], chunk["probability"], codes
+            ))
+            chunk = {column: chunk[column][rows] for column in self.columns}
+            chunk["symbol"] = codes[rows]
+            self.chunks = [chunk]
+            self.curve_chunks = [
+                dict(curve_chunk, symbol=ranks[curve_chunk["symbol"]])
+                for curve_chunk in self.curve_chunks
+            ]
+            self.symbols = [self.symbols[code] for code in order]
+            self.symbol_codes = {
+                symbol: code for code, symbol in enumerate(self.symbols)
+            }
+
+    def symbol_code(self, symbol):
+        """
+        Get the integer code our symbol column stores for symbol. Must be
+        called while holding our lock
+        """
+        if symbol not in self.symbol_codes:
+            self.symbol_codes[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        return self.symbol_codes[symbol]
+
+    def append(self, symbol, dates, interval, pre, post, random=False,
+               views=nan, quantile=nan, probability=nan):
+        """
+        Add a chunk of events for a symbol evaluated over a single interval.
+        views and quantile may be given per event or once for all of them
+        """
+        pre = asarray(pre, dtype=float64)
+        if not len(pre):
+            return
+        chunk = {
+            "date": asarray(dates, dtype="datetime64[D]"),
+            "interval": full(len(pre), interval, dtype=int32),
+            "pre": pre,
+            "post": asarray(post, dtype=float64),
+            "random": full(len(pre), random, dtype=bool_),
+            "views": broadcast_to(asarray(views, float64), len(pre)).copy(),
+            "quantile": full(len(pre), quantile, dtype=float64),
+            "probability": full(len(pre), probability, dtype=float64),
+        }
+        with self.lock:
+            chunk["symbol"] = full(len(pre), self.symbol_code(symbol), int32)
+            self.chunks.append(chunk)
+
+    def append_curves(self, symbol, dates, curves, probability=nan):
+        """
+        Add the cumulative return curves of a chunk of outlier events for a
+        symbol, one row per event
+        """
+        curves = asarray(curves, dtype=float64)
+        if not len(curves):
+            return
+        chunk = {
+            "date": asarray(dates, dtype="datetime64[D]"),
+            "probability": full(len(curves), probability, dtype=float64),
+            "curve": curves,
+        }
+        with self.lock:
+            chunk["symbol"] = full(
+                len(curves), self.symbol_code(symbol), int32
+            )
+            self.curve_chunks.append(chunk)
+
+    def curves(self, probability=None):
+        """
+        Return the event dates and the events x offsets matrix of curves of
+        all events with a curve, or of the ones found at a single probability
+        """
+        with self.lock:
+            chunks = list(self.curve_chunks)
+        if not chunks:
+            return empty(0, dtype="datetime64[D]"), empty((0, 0))
+        dates = concatenate([chunk["date"] for chunk in chunks])
+        curves = concatenate([chunk["curve"] for chunk in chunks])
+        if probability is not None:
+            mask = concatenate([chunk["probability"] for chunk in chunks])
+            mask = mask == probability
+            dates, curves = dates[mask], curves[mask]
+        return dates, curves
+
+    def merge(self, other):
+        """
+        Add all events from another EventResults object
+        """
+        with other.lock:
+            symbols = list(other.symbols)
+            chunks = list(other.chunks)
+            curve_chunks = list(other.curve_chunks)
+            pages = dict(other.pages)
+
+        with self.lock:
+            self.pages.update(pages)
+            codes = asarray(
+                [self.symbol_code(symbol) for symbol in symbols], dtype=int32
+            )
+            for chunk in chunks:
+                chunk = dict(chunk, symbol=codes[chunk["symbol"]])
+                self.chunks.append(chunk)
+            for chunk in curve_chunks:
+                chunk = dict(chunk, symbol=codes[chunk["symbol"]])
+                self.curve_chunks.append(chunk)
+
+    def column(self, name):
+        """
+        Return a whole column. Our chunks are compacted into one when a
+        column is read
+        """
+        with self.lock:
+            return self.compact()[name]
+
+    def compact(self):
+        """
+        Concatenate all of our chunks into a single chunk and return it. Must
+        be called while holding our lock
+        """
+        if len(self.chunks) != 1:
+            chunks = self.chunks
+            self.chunks = [{
+                column: concatenate(
+                    [chunk[column] for chunk in chunks] or
+                    [empty(0, dtype=dtype)]
+                )
+                for column, dtype in self.columns.iteritems()
+            }]
+        return self.chunks[0]
+
+    def intervals(self, random=False):
+        """
+        Return the sorted list of intervals we have events for
+        """
+        mask = self.column("random") == random
+        return sorted(set(self.column("interval")[mask].tolist()))
+
+    def returns(self, interval, random=False, probability=None):
+        """
+        Return the pre and post returns of all events for an interval. random
+        selects events drawn on random days instead of outlier events, and
+        probability the outlier events found at a single probability
+        """
+        mask = (
+            (self.column("interval") == interval) &
+            (self.column("random") == random)
+        )
+        if probability is not None:
+            mask &= self.column("probability") == probability
+        return self.column("pre")[mask], self.column("post")[mask]
@@ -0,0 +1,218 @@
+"""
+discerner.server
+~~~~~~~~~~~~~~~~
+
+Long lived process answering discerner queries over http, so that page
+views, prices, http connections and R stay loaded between them. Queries run
+as the user that started the server, so they have to carry the token it
+writes to a file only that user can read.
+
+    python -m discerner.server --port 8765
+    discerner --connect localhost:8765 -t HISTORICAL custom AAPL:Apple_Inc
+"""
+from __future__ import print_function
+from argparse import ArgumentParser
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from binascii import hexlify
+from cStringIO import StringIO
+from hmac import compare_digest
+import json
+from logging import StreamHandler
+import os
+from os.path import expanduser, join
+import signal
+import sys
+import traceback
+
+from discerner.cache import make_cache_dir
+from discerner.defaults import cache_dir, logger, server_host, server_port
+
+TOKEN_HEADER = "X-Discerner-Token"
+
+
+def token_path(directory, port):
+    """
+    Path of the token of the server listening on port
+    """
+    return join(expanduser(directory), "server", "token-{}".format(port))
+
+
+def write_token(directory, port):
+    """
+    Write a new random token for the server listening on port to a file only
+    we can read, returning the token
+    """
+    token = hexlify(os.urandom(32))
+    os.chmod(make_cache_dir(directory, "server"), 0700)
+    path = token_path(directory, port)
+    descriptor = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0600)
+    try:
+        os.fchmod(descriptor, 0600)
+        os.write(descriptor, token)
+    finally:
+        os.close(descriptor)
+    return token
+
+
+def read_token(directory, port):
+    """
+    Read the token of the server listening on port, None if there is none
+    """
+    try:
+        with open(token_path(directory, port)) as file_:
+            return file_.read().strip()
+    except IOError:
+        return None
+
+
+def run_query(argv, cwd):
+    """
+    Run the command line argv as if it was run from cwd, returning its exit
+    status and everything it printed. Queries share our process and its
+    output so they are run one at a time
+    """
+    from discerner.main import parse_argv, run
+
+    stdout, stderr = sys.stdout, sys.stderr
+    handler = StreamHandler(StringIO())
+    handler.setFormatter(logger.handlers[0].formatter)
+    sys.stdout, sys.stderr = StringIO(), handler.stream
+    logger.addHandler(handler)
+    previous = os.getcwd()
+    status = 0
+    try:
+        os.chdir(cwd)
+        args = parse_argv(argv)
+        if args.watch:
+            raise ValueError("--watch can not be run on a server")
+        # Worker processes would print to their own copy of our stdout
+        args.processes = 1
+        args.no_plot = args.no_plot or not args.plot_output
+        run(args)
+    except SystemExit as error:
+        status = error.code or 0
+    except Exception:
+        traceback.print_exc(file=sys.stderr)
+        status = 1
+    finally:
+        output = sys.stdout.getvalue(), sys.stderr.getvalue()
+        sys.stdout, sys.stderr = stdout, stderr
+        logger.removeHandler(handler)
+        os.chdir(previous)
+    return status, output[0], output[1]
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """
+    Run the json {"argv": [...], "cwd": "..."} query posted to us and reply
+    with its json {"status": ..., "stdout": "...", "stderr": "..."}. Web
+    pages can not send json without asking us first, which we never allow,
+    and requests for any other host are refused so that pages can not get
+    around that by pointing their own domain at us. Every query has to carry
+    the token of our server, which keeps out other users of the machine
+    """
+    def do_POST(self):
+        token = self.headers.getheader(TOKEN_HEADER, "")
+        if not compare_digest(token, self.server.token):
+            self.send_error(403, "Invalid token")
+            return
+        content_type = self.headers.getheader("content-type", "")
+        if content_type.split(";")[0].strip() != "application/json":
+            self.send_error(415, "Expected application/json")
+            return
+        if self.headers.getheader("host") not in self.allowed_hosts():
+            self.send_error(403, "Unexpected host")
+            return
+        try:
+            length = int(self.headers.getheader("content-length"))
+            request = json.loads(self.rfile.read(length))
+            argv, cwd = request["argv"], request["cwd"]
+        except (TypeError, ValueError, KeyError):
+            self.send_error(400, "Expected a json argv and cwd")
+            return
+
+        logger.info("Query: {}".format(" ".join(argv)))
+        status, stdout, stderr = run_query(argv, cwd)
+        body = json.dumps(
+            {"status": status, "stdout": stdout, "stderr": stderr}
+        )
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def allowed_hosts(self):
+        host, port = self.server.server_address[:2]
+        return {
+            "{}:{}".format(name, port)
+            for name in (host, "localhost", "127.0.0.1")
+        }
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+def query(address, argv, directory=cache_dir):
+    """
+    Run argv on the server at a (host, port) address, printing its output.
+    The server's token is read from directory. Returns the exit status of
+    the query
+    """
+    import requests
+
+    token = read_token(directory, address[1])
+    if token is None:
+        print("No token for a discerner server on port {} in {}".format(
+            address[1], directory
+        ), file=sys.stderr)
+        return 1
+    try:
+        # Our own server is either up or not, so there is nothing to retry
+        response = requests.post(
+            "http://{}:{}/".format(*address),
+            data=json.dumps({"argv": argv, "cwd": os.getcwd()}),
+            headers={"Content-Type": "application/json", TOKEN_HEADER: token},
+            timeout=None
+        )
+        response.raise_for_status()
+    except requests.RequestException as error:
+        print("Could not query the discerner server at {}:{}: {}".format(
+            address[0], address[1], error
+        ), file=sys.stderr)
+        return 1
+    reply = response.json()
+    sys.stdout.write(reply["stdout"])
+    sys.stderr.write(reply["stderr"])
+    return reply["status"]
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--host", default=server_host)
+    parser.add_argument("--port", type=int, default=server_port)
+    parser.add_argument(
+        "--cache-dir",
+        default=cache_dir,
+        help="Directory to write our token to, clients read it from their "
+        "--cache-dir"
+    )
+    args = parser.parse_args()
+
+    server = HTTPServer((args.host, args.port), QueryHandler)
+    port = server.server_address[1]
+    server.token = write_token(args.cache_dir, port)
+    logger.info("Serving on {}:{}".format(args.host, port))
+    # Remove our token when we are killed too
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Stopped serving")
+    finally:
+        server.server_close()
+        os.remove(token_path(args.cache_dir, port))
+
+
+if __name__ == "__main__":
+    main()
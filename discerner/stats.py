@@ -0,0 +1,130 @@
+"""
+discerner.stats
+~~~~~~~~~~~~~~~
+"""
+from __future__ import division
+
+from numpy import (
+    absolute, asarray, concatenate, count_nonzero, cumsum, diff, float64,
+    isnan, maximum, nan, nansum, percentile, sqrt, where, zeros
+)
+
+PERCENTILES = (5, 25, 50, 75, 95)
+# Two sided 95% quantile of the standard normal distribution
+NORMAL_95 = 1.959963984540054
+
+
+def sign_flips(pre, post):
+    """
+    Mask of events whose post return has the opposite sign of their pre return
+    """
+    pre = asarray(pre, dtype=float64)
+    post = asarray(post, dtype=float64)
+    return ((pre > 0) & (post < 0)) | ((pre < 0) & (post > 0))
+
+
+def conditional_returns(pre, post, percentiles=PERCENTILES):
+    """
+    Describe the distribution of post returns conditional on whether the pre
+    return went up, down or stayed flat
+    """
+    pre = asarray(pre, dtype=float64)
+    post = asarray(post, dtype=float64)
+    distributions = {}
+    for name, mask in (("up", pre > 0), ("down", pre < 0), ("flat", pre == 0)):
+        values = post[mask]
+        distributions[name] = {
+            "count": len(values),
+            "mean": values.mean() if len(values) else nan,
+            "percentiles": dict(zip(
+                percentiles,
+                percentile(values, percentiles) if len(values)
+                else [nan] * len(percentiles)
+            )),
+        }
+    return distributions
+
+
+def bootstrap_flip_rate(flips, resamples, random_state, confidence=.95):
+    """
+    Bootstrap confidence interval of the sign flip rate. Resampling binary
+    flip indicators with replacement gives a binomial number of flips, so all
+    resamples are drawn in one batch.
+    """
+    if not len(flips):
+        return nan, nan
+    rate = count_nonzero(flips) / len(flips)
+    rates = random_state.binomial(len(flips), rate, size=resamples)
+    tail = (1 - confidence) / 2 * 100
+    low, high = percentile(rates / len(flips), [tail, 100 - tail])
+    return low, high
+
+
+def compare_flip_rates(flips, baseline_flips, resamples, random_state):
+    """
+    Two sided permutation test of the difference between the sign flip rate
+    of our events and that of a baseline. Shuffling the pooled flip
+    indicators between both groups only changes how many flips land in each
+    group, which follows a hypergeometric distribution, so all resamples are
+    drawn in one batch. Returns the observed difference and its p-value.
+    """
+    size, baseline_size = len(flips), len(baseline_flips)
+    if not size or not baseline_size:
+        return nan, nan
+
+    count = count_nonzero(flips)
+    total = count + count_nonzero(baseline_flips)
+    observed = count / size - (total - count) / baseline_size
+    drawn = random_state.hypergeometric(
+        total, size + baseline_size - total, size, size=resamples
+    )
+    differences = drawn / size - (total - drawn) / baseline_size
+    # Allow for float error when comparing against the observed difference
+    extreme = count_nonzero(
+        absolute(differences) >= absolute(observed) - 1e-12
+    )
+    return observed, (extreme + 1) / (resamples + 1)
+
+
+def mean_curve(curves, z=NORMAL_95):
+    """
+    Average the curves of an events x offsets matrix at every offset, along
+    with the bounds of a normal confidence band around the average. Events
+    missing an offset are left out of its average
+    """
+    curves = asarray(curves, dtype=float64)
+    counts = count_nonzero(~isnan(curves), axis=0)
+    sizes = maximum(counts, 1)
+    mean = where(counts > 0, nansum(curves, axis=0) / sizes, nan)
+    squares = nansum((curves - mean) ** 2, axis=0)
+    error = z * sqrt(squares / maximum(counts - 1, 1)) / sqrt(sizes)
+    error = where(counts > 1, error, nan)
+    return mean, mean - error, mean + error
+
+
+class EqualWeightedIndex(object):
+    """
+    Log price of an index holding an equal weight of every stock added to
+    it. Every day the index moves by the average log return of the stocks
+    that have prices on that day and the one before
+    """
+    def __init__(self):
+        self.sums = None
+        self.counts = None
+
+    def add(self, log_prices):
+        returns = diff(asarray(log_prices, dtype=float64))
+        valid = ~isnan(returns)
+        if self.sums is None:
+            self.sums = zeros(len(returns), dtype=float64)
+            self.counts = zeros(len(returns), dtype=int)
+        self.sums += where(valid, returns, 0)
+        self.counts += valid
+
+    def log_prices(self):
+        if self.sums is None:
+            return zeros(0, dtype=float64)
+        returns = where(
+            self.counts > 0, self.sums / maximum(self.counts, 1), 0
+        )
+        return concatenate(([0.0], cumsum(returns)))
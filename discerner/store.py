@@ -0,0 +1,282 @@
+"""
+discerner.store
+~~~~~~~~~~~~~~~
+"""
+from collections import namedtuple
+from contextlib import contextmanager
+import fcntl
+import json
+import os
+from os.path import exists, join
+from threading import Lock
+
+from numpy import flatnonzero, float64, full, isnan, memmap, nan
+
+from discerner.cache import make_cache_dir, write_atomic
+from discerner.defaults import logger, store_capacity
+from discerner.metrics import metrics
+from discerner.utils import add_days, days_between, today
+
+# Read only maps of store matrices by path, along with their shape
+_maps = {}
+
+
+class PricesReference(namedtuple(
+    "PricesReference", ("path", "shape", "column", "offset", "length")
+)):
+    """
+    Location of the prices of a symbol in a price store matrix. References
+    are sent to worker processes instead of prices, so that workers map the
+    matrix themselves rather than receive a copy
+    """
+    def load(self):
+        """
+        Return the prices as a read only view of the matrix, which stays
+        mapped for the life of the process
+        """
+        shape, matrix = _maps.get(self.path, (None, None))
+        if shape != self.shape:
+            matrix = memmap(
+                self.path, dtype=float64, mode="r", shape=self.shape
+            )
+            _maps[self.path] = (self.shape, matrix)
+        closes = matrix[self.offset:self.offset + self.length, self.column]
+        closes.reference = self
+        return closes
+
+
+def resolve_prices(prices):
+    """
+    Load prices that were sent as a PricesReference
+    """
+    if isinstance(prices, PricesReference):
+        return prices.load()
+    return prices
+
+
+class PriceStore(object):
+    """
+    Wrap a price source so that the prices of all symbols live in a single
+    memory mapped float64 matrix with a row per calendar day and a column per
+    symbol, next to a json index of its first day and symbol columns. Repeat
+    runs map the file instead of reading it, and loaded prices are read only
+    views of the mapping that carry their PricesReference. New days are
+    appended to the end of the file and new symbols take spare columns, so
+    the matrix is only rewritten when it has to start earlier or runs out of
+    columns. The flip side is that a symbol is a column strided by a whole
+    row, so reading it touches a page of the file per day in stores of 512
+    columns or more. Processes sharing a store take a lock on its files
+    around every change and reload the index under it.
+    """
+    def __init__(self, source, directory, capacity=store_capacity):
+        self.source = source
+        self.directory = make_cache_dir(directory, "store")
+        self.matrix_path = join(self.directory, "prices.f8")
+        self.index_path = join(self.directory, "index.json")
+        self.lock_path = join(self.directory, "lock")
+        self.capacity = capacity
+        self.lock = Lock()
+        self.symbol_locks = {}
+        self.index_stat = None
+        self.index = self.read_index()
+        self.matrix = None
+
+    @contextmanager
+    def locked(self):
+        """
+        Hold our thread lock along with an exclusive lock on our files that
+        other processes take too, reloading our index if another process
+        changed it
+        """
+        with self.lock:
+            with open(self.lock_path, "a") as file_:
+                fcntl.flock(file_, fcntl.LOCK_EX)
+                try:
+                    if self.index_stat != self.stat_index():
+                        self.index = self.read_index()
+                    yield
+                finally:
+                    fcntl.flock(file_, fcntl.LOCK_UN)
+
+    def stat_index(self):
+        try:
+            stat = os.stat(self.index_path)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime, stat.st_size
+
+    def read_index(self):
+        """
+        Return our index, None if the store has not been created yet
+        """
+        self.index_stat = self.stat_index()
+        try:
+            with open(self.index_path) as file_:
+                index = json.load(file_)
+        except (IOError, ValueError):
+            return None
+        if not exists(self.matrix_path):
+            return None
+        return index
+
+    def write_index(self):
+        write_atomic(self.index_path, json.dump, self.index)
+        self.index_stat = self.stat_index()
+
+    def symbol_lock(self, symbol):
+        with self.lock:
+            return self.symbol_locks.setdefault(symbol, Lock())
+
+    def open(self):
+        """
+        Map our matrix, None while it has no days. Must be called while
+        holding our locks
+        """
+        shape = (self.index["days"], self.index["capacity"])
+        if not shape[0]:
+            return None
+        if self.matrix is None or self.matrix.shape != shape:
+            self.matrix = memmap(
+                self.matrix_path, dtype=float64, mode="r+", shape=shape
+            )
+        return self.matrix
+
+    def create(self, start):
+        self.index = {
+            "start": start,
+            "days": 0,
+            "capacity": self.capacity,
+            "symbols": {},
+            "begins": {},
+            "filled": {},
+            "fetched": {},
+        }
+        open(self.matrix_path, "wb").close()
+
+    def rebuild(self, start, capacity):
+        """
+        Copy our matrix into a new one beginning at start with capacity
+        columns
+        """
+        old = self.open()
+        offset = days_between(start, self.index["start"])
+        days = offset + self.index["days"]
+        tmp_path = "{}.{}.tmp".format(self.matrix_path, os.getpid())
+        matrix = memmap(
+            tmp_path, dtype=float64, mode="w+", shape=(days, capacity)
+        )
+        matrix[:] = nan
+        if old is not None:
+            matrix[offset:, :old.shape[1]] = old
+        matrix.flush()
+        del matrix
+        os.rename(tmp_path, self.matrix_path)
+
+        self.matrix = None
+        self.index.update(start=start, days=days, capacity=capacity)
+        for rows in (self.index["begins"], self.index["filled"]):
+            for symbol in rows:
+                rows[symbol] += offset
+        self.write_index()
+
+    def append_days(self, days):
+        """
+        Append rows of NaN to our matrix until it holds days days
+        """
+        extra = days - self.index["days"]
+        if extra <= 0:
+            return
+        rows = full((extra, self.index["capacity"]), nan, dtype=float64)
+        with open(self.matrix_path, "ab") as file_:
+            file_.write(rows.tobytes())
+        self.index["days"] = days
+
+    def prepare(self, symbol, start, end):
+        """
+        Make room for symbol from start to end, returning the day we need to
+        download its prices from or None if it is up to date. Must be called
+        while holding our locks
+        """
+        if self.index is None:
+            self.create(start)
+        elif days_between(self.index["start"], start) < 0:
+            logger.debug("Extending the price store back to %s", start)
+            self.rebuild(start, self.index["capacity"])
+
+        symbols = self.index["symbols"]
+        row = days_between(self.index["start"], start)
+        if symbol not in symbols:
+            if len(symbols) == self.index["capacity"]:
+                self.rebuild(self.index["start"], self.index["capacity"] * 2)
+            symbols[symbol] = len(symbols)
+            self.index["begins"][symbol] = self.index["filled"][symbol] = row
+            self.write_index()
+        elif self.index["begins"][symbol] > row:
+            # Download everything again, like PriceCache does
+            self.index["begins"][symbol] = self.index["filled"][symbol] = row
+            self.write_index()
+        elif self.index["fetched"].get(symbol) == today():
+            return None
+
+        first = add_days(self.index["start"], self.index["filled"][symbol])
+        if days_between(first, end) < 0:
+            return None
+        return first
+
+    def write(self, symbol, first, closes):
+        """
+        Write the prices of symbol beginning at first into our matrix,
+        dropping the NaNs after the last quote so that those days are
+        downloaded again on the next refresh. Must be called while holding our
+        locks
+        """
+        quoted = flatnonzero(~isnan(closes))
+        if len(quoted):
+            closes = closes[:quoted[-1] + 1]
+            row = days_between(self.index["start"], first)
+            self.append_days(row + len(closes))
+            matrix = self.open()
+            matrix[row:row + len(closes), self.index["symbols"][symbol]] = (
+                closes
+            )
+            matrix.flush()
+            self.index["filled"][symbol] = row + len(closes)
+        self.index["fetched"][symbol] = today()
+        self.write_index()
+
+    def load(self, symbol, start, end):
+        """
+        Load daily prices from start to end, downloading only what we are
+        missing. Symbols are downloaded concurrently but written one at a
+        time
+        """
+        with self.symbol_lock(symbol):
+            with self.locked():
+                first = self.prepare(symbol, start, end)
+            if first is None:
+                metrics.count("price_store_hits")
+            else:
+                metrics.count("price_store_misses")
+                closes = self.source.load(symbol, first, end)
+                with self.locked():
+                    self.write(symbol, first, closes)
+
+        return self.reference(symbol, start, end).load()
+
+    def reference(self, symbol, start, end):
+        """
+        Locate the prices of a loaded symbol from start to end. Days up to
+        end that have not been quoted yet are appended as NaN, so the prices
+        are always a single view of our matrix
+        """
+        with self.locked():
+            offset = days_between(self.index["start"], start)
+            length = days_between(start, end) + 1
+            if offset + length > self.index["days"]:
+                self.append_days(offset + length)
+                self.write_index()
+            return PricesReference(
+                self.matrix_path,
+                (self.index["days"], self.index["capacity"]),
+                self.index["symbols"][symbol], offset, length
+            )
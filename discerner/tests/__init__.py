@@ -0,0 +1,45 @@
+"""
+discerner.tests
+~~~~~~~~~~~~~~~
+
+Fixtures shared by the tests of several modules
+"""
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from numpy import array
+
+from discerner.utils import days_between
+
+temp_dirs = []
+
+
+def setup_temp_dir():
+    temp_dirs.append(mkdtemp())
+
+
+def teardown_temp_dir():
+    rmtree(temp_dirs.pop())
+
+
+def temp_dir():
+    """
+    Return the directory made by setup_temp_dir for the running test
+    """
+    return temp_dirs[-1]
+
+
+class PriceSource(object):
+    """
+    Price source serving daily closes of every symbol from 2013-01-01 on,
+    recording the calls made to it
+    """
+    def __init__(self, closes):
+        self.closes = closes
+        self.calls = []
+
+    def load(self, symbol, start, end):
+        self.calls.append((symbol, start, end))
+        offset = days_between("2013-01-01", start)
+        closes = self.closes[symbol]
+        return array(closes[offset:offset + days_between(start, end) + 1])
@@ -0,0 +1,47 @@
+"""
+discerner.tests.test_analyze
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+"""
+from argparse import Namespace
+
+from nose.tools import eq_
+
+from discerner.analyze import (
+    analyze_page_view_data, detect_rolling_outliers, perform_event_study
+)
+from discerner.quantiles import find_rolling_outliers
+from discerner.results import EventResults
+
+
+def test_perform_event_study_without_events():
+    """
+    Test discerner.analyze.perform_event_study gives up when no outlier
+    event has a curve
+    """
+    args = Namespace(
+        interval=[5, 14], probability=[.9], start="2013-01-01",
+        end="2013-12-31", benchmark="SPY"
+    )
+    results = EventResults()
+    results.append("AAPL", ["2013-02-01"], 5, [.1], [.2], random=True)
+    eq_(perform_event_study(args, results), None)
+
+
+def test_detect_rolling_outliers():
+    """
+    Test discerner.analyze.detect_rolling_outliers hands every page on with
+    the rolling outliers of every probability, and passes missing pages on
+    """
+    args = Namespace(
+        detector="rolling", window=3, min_periods=2, probability=[.5, .9]
+    )
+    data = {"2013-01-01": 10, "2013-01-02": 12, "2013-01-03": 30}
+    views = [("AAPL", "Apple_Inc", data), ("MSFT", "Microsoft", None)]
+    detected = list(detect_rolling_outliers(args, iter(views)))
+    eq_(detected, views)
+    eq_(detected[1][2], None)
+    for probability in args.probability:
+        eq_(
+            analyze_page_view_data(args, detected[0][2], probability),
+            find_rolling_outliers([data], 3, probability, 2)[0]
+        )
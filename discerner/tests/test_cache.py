@@ -0,0 +1,95 @@
+"""
+discerner.tests.test_cache
+~~~~~~~~~~~~~~~~~~~~~~~~~~
+"""
+import os
+
+from nose.tools import eq_, with_setup
+from numpy import isnan, nan
+
+from discerner.cache import PageViewCache, PriceCache
+from discerner.tests import (
+    PriceSource, setup_temp_dir, teardown_temp_dir, temp_dir
+)
+
+
+class Fetcher(object):
+    def __init__(self, views):
+        self.views = views
+        self.calls = 0
+
+    def __call__(self, page):
+        self.calls += 1
+        return dict(self.views)
+
+
+@with_setup(setup_temp_dir, teardown_temp_dir)
+def test_page_view_cache_hit():
+    """
+    Test discerner.cache.PageViewCache does not refetch fresh pages
+    """
+    cache = PageViewCache(temp_dir(), ttl=60, max_age=60)
+    fetch = Fetcher({"2013-01-01": 10, "2013-01-02": 20})
+    eq_(cache.get("Apple_Inc", fetch), fetch.views)
+    eq_(cache.get("Apple_Inc", fetch), fetch.views)
+    eq_(fetch.calls, 1)
+
+
+@with_setup(setup_temp_dir, teardown_temp_dir)
+def test_page_view_cache_refreshes_stale_pages():
+    """
+    Test discerner.cache.PageViewCache returns the same days as a fresh
+    download once a page is refreshed
+    """
+    cache = PageViewCache(temp_dir(), ttl=0, max_age=60)
+    cache.get("Apple_Inc", Fetcher({"2013-01-01": 10, "2013-01-02": 20}))
+    fetch = Fetcher({"2013-01-02": 25, "2013-01-03": 30})
+    views = cache.get("Apple_Inc", fetch)
+    eq_(fetch.calls, 1)
+    eq_(views, fetch.views)
+
+
+@with_setup(setup_temp_dir, teardown_temp_dir)
+def test_page_view_cache_keeps_pages_in_memory():
+    """
+    Test discerner.cache.PageViewCache only reads a page from disk once
+    """
+    cache = PageViewCache(temp_dir(), ttl=60, max_age=60)
+    fetch = Fetcher({"2013-01-01": 10})
+    cache.get("Apple_Inc", fetch)
+    os.remove(cache.path("Apple_Inc"))
+    eq_(cache.get("Apple_Inc", fetch), fetch.views)
+    eq_(fetch.calls, 1)
+
+
+@with_setup(setup_temp_dir, teardown_temp_dir)
+def test_price_cache_memoizes_symbols():
+    """
+    Test discerner.cache.PriceCache only downloads a symbol once
+    """
+    source = PriceSource({"SPY": [1.0, 2.0, 3.0]})
+    cache = PriceCache(source, temp_dir())
+    cache.load("SPY", "2013-01-01", "2013-01-03")
+    prices = cache.load("SPY", "2013-01-02", "2013-01-03")
+    eq_(list(prices), [2.0, 3.0])
+    eq_(len(source.calls), 1)
+
+    cache = PriceCache(source, temp_dir())
+    prices = cache.load("SPY", "2013-01-01", "2013-01-03")
+    eq_(list(prices), [1.0, 2.0, 3.0])
+    eq_(len(source.calls), 1)
+
+
+@with_setup(setup_temp_dir, teardown_temp_dir)
+def test_price_cache_appends_new_days():
+    """
+    Test discerner.cache.PriceCache only downloads days after its last price
+    """
+    source = PriceSource({"SPY": [1.0, 2.0, nan, 4.0, 5.0]})
+    cache = PriceCache(source, temp_dir())
+    cache.load("SPY", "2013-01-01", "2013-01-03")
+    cache.memo["SPY"]["fetched"] = "2013-01-03"
+    prices = cache.load("SPY", "2013-01-01", "2013-01-05")
+    eq_(source.calls[-1], ("SPY", "2013-01-03", "2013-01-05"))
+    eq_(list(prices[[0, 1, 3, 4]]), [1.0, 2.0, 4.0, 5.0])
+    assert isnan(prices[2])
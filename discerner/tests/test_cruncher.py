@@ -4,10 +4,13 @@ discerner.tests.test_cruncher
 """
 from argparse import Namespace
 from nose.tools import eq_, raises
+from numpy import array, exp, isnan, nan
 from rpy2.rinterface import NARealType
 
 from discerner.cruncher import (
-    find_non_nan, get_start_index, get_end_index, get_pages
+    find_non_nan, get_cumulative_returns, get_day_indices, get_event_windows,
+    get_log_prices, get_start_index, get_end_index, get_pages,
+    get_valid_indices, get_window_returns, make_returns_data
 )
 from discerner.exceptions import SkipEvaluationError
 from discerner.pages import get_financial_pages
@@ -134,6 +137,46 @@ def test_get_end_index_for_error():
     get_end_index(data, 0)
 
 
+def test_get_valid_indices():
+    """
+    Test discerner.cruncher.get_valid_indices
+    """
+    previous, next_ = get_valid_indices([nan, 1, nan, nan, 4, nan])
+    eq_(list(previous), [-1, 1, 1, 1, 4, 4])
+    eq_(list(next_), [1, 1, 4, 4, 4, 6])
+
+
+def test_get_event_windows():
+    """
+    Test discerner.cruncher.get_event_windows resolves all events at once and
+    masks the ones that cannot be evaluated
+    """
+    prices = array(range(10) + [nan] + range(11, 30), dtype=float)
+    windows = get_event_windows(prices, [5, 13, 14, 29], 3)
+    pre_start, pre_end, post_start, post_end, invalid = windows
+    eq_(list(invalid), [False, False, False, True])
+    eq_(list(pre_start[:3]), [2, 9, 11])
+    eq_(list(pre_end[:3]), [4, 11, 13])
+    eq_(list(post_start[:3]), [6, 14, 15])
+    eq_(list(post_end[:3]), [8, 16, 17])
+
+
+def test_get_window_returns():
+    """
+    Test discerner.cruncher.get_window_returns for several intervals at once
+    """
+    prices = array([1, 2, 4, 8, 16, 32, 64], dtype=float)
+    pre, post, invalid = get_window_returns(prices, [2, 3, 5], [1, 2])
+    eq_(pre.shape, (2, 3))
+    eq_(list(invalid[0]), [False, False, False])
+    eq_(list(invalid[1]), [False, False, True])
+    eq_(list(pre[0]), [0, 0, 0])
+    eq_(list(post[0]), [0, 0, 0])
+    eq_(list(pre[1][:2]), [1, 1])
+    eq_(list(post[1][:2]), [1, 1])
+    assert isnan(pre[1][2]) and isnan(post[1][2])
+
+
 def test_get_pages_for_function():
     """
     Test discerner.analyze.get_pages with a function
@@ -152,3 +195,40 @@ def test_get_pages_for_list():
     expected = {"MSFT": "Microsoft", "AAPL": "Apple_Inc"}
     for symbol in pages:
         eq_(expected[symbol], pages[symbol])
+
+
+def test_get_day_indices():
+    """
+    Test discerner.cruncher.get_day_indices across a year boundary
+    """
+    dates = ["2012-12-30", "2013-01-02", "2014-01-01", "2014-01-03"]
+    days, outside = get_day_indices("2012-12-31", 367, dates)
+    eq_(list(outside), [True, False, False, True])
+    eq_(list(days[~outside]), [2, 366])
+
+
+def test_make_returns_data():
+    """
+    Test discerner.cruncher.make_returns_data sorts inflections by pre - post
+    and keeps the order of other events
+    """
+    data = make_returns_data([.1, .3, -.2, .2, -.1], [.2, -.1, .1, .1, .3])
+    eq_(list(data["pre"]), [-.1, -.2, .1, .2, .3])
+    eq_(list(data["post"]), [.3, .1, .2, .1, -.1])
+    eq_(data["max"], .3)
+    eq_(data["min"], -.2)
+
+
+def test_get_cumulative_returns():
+    """
+    Test discerner.cruncher.get_cumulative_returns accumulates from the start
+    of every window, carries prices over missing days and leaves offsets
+    outside of the series NaN
+    """
+    log_prices = get_log_prices([nan, 1.0, 2.0, nan, 4.0])
+    assert isnan(log_prices[0])
+    curves = exp(get_cumulative_returns(log_prices, [2, 3, 4], 2)).round(12)
+    assert isnan(curves[0]).all()
+    eq_(list(curves[1, :4]), [1.0, 2.0, 2.0, 4.0])
+    eq_(list(curves[2, :3]), [1.0, 1.0, 2.0])
+    assert isnan(curves[1, 4]) and isnan(curves[2, 3:]).all()
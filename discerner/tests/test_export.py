@@ -0,0 +1,41 @@
+"""
+discerner.tests.test_export
+~~~~~~~~~~~~~~~~~~~~~~~~~~~
+"""
+import json
+from os.path import join
+
+from nose.tools import eq_, with_setup
+from numpy import isnan, load
+
+from discerner.export import EventExporter
+from discerner.results import EventResults
+from discerner.tests import setup_temp_dir, teardown_temp_dir, temp_dir
+
+
+@with_setup(setup_temp_dir, teardown_temp_dir)
+def test_event_exporter():
+    """
+    Test discerner.export.EventExporter streams events into .npy columns
+    """
+    with EventExporter(temp_dir()) as exporter:
+        for symbol, page in (("AAPL", "Apple_Inc"), ("MSFT", "Microsoft")):
+            results = EventResults()
+            results.pages[symbol] = page
+            results.append(
+                symbol, ["2013-01-02", "2013-01-03"], 5, [.1, .2], [.3, .4],
+                views=[100, 200], quantile=50
+            )
+            results.append(symbol, ["2013-02-01"], 5, [.5], [.6], random=True)
+            exporter.write(results)
+
+    symbols = load(join(temp_dir(), "symbol.npy"), mmap_mode="r")
+    eq_(list(symbols), [0, 0, 0, 1, 1, 1])
+    eq_(list(load(join(temp_dir(), "pre.npy"))), [.1, .2, .5] * 2)
+    eq_(str(load(join(temp_dir(), "date.npy"))[2]), "2013-02-01")
+    views = load(join(temp_dir(), "views.npy"))
+    eq_(list(views[:2]), [100, 200])
+    assert isnan(views[2])
+    eq_(list(load(join(temp_dir(), "quantile.npy"))[:2]), [50, 50])
+    with open(join(temp_dir(), "categories.json")) as file_:
+        eq_(json.load(file_)[1], {"symbol": "MSFT", "page": "Microsoft"})
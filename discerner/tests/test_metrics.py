@@ -0,0 +1,37 @@
+"""
+discerner.tests.test_metrics
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+"""
+from nose.tools import eq_
+
+from discerner.metrics import Metrics
+
+
+def test_metrics_disabled():
+    """
+    Test disabled discerner.metrics.Metrics record nothing
+    """
+    metrics = Metrics()
+    with metrics.timer("fetch_views", "AAPL"):
+        metrics.count("view_cache_hits", symbol="AAPL")
+    eq_(metrics.snapshot(), {"stages": {}, "counters": {}, "symbols": {}})
+
+
+def test_metrics_merge():
+    """
+    Test discerner.metrics.Metrics adds up stages, counters and symbols,
+    including ones recorded elsewhere
+    """
+    metrics = Metrics(enabled=True)
+    with metrics.timer("analyze", "AAPL"):
+        metrics.count("events", 3, "AAPL")
+    other = Metrics(enabled=True)
+    other.count("events", 2, "MSFT")
+    other.add_time("analyze", 1.0, "MSFT")
+    metrics.merge(other.snapshot())
+
+    snapshot = metrics.snapshot()
+    eq_(snapshot["stages"]["analyze"]["calls"], 2)
+    eq_(snapshot["counters"], {"events": 5})
+    eq_(snapshot["symbols"]["MSFT"], {"events": 2, "analyze_seconds": 1.0})
+    eq_(snapshot["symbols"]["AAPL"]["events"], 3)
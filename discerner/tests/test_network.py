@@ -0,0 +1,87 @@
+"""
+discerner.tests.test_network
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+"""
+from nose.tools import eq_, raises, with_setup
+from requests.exceptions import ConnectionError
+
+from discerner import network
+from discerner.network import FailureBudget, call_with_retries
+
+
+settings = None
+
+
+def setup_no_backoff():
+    global settings
+    settings = dict(network._settings)
+    network._settings["backoff"] = 0
+
+
+def teardown_no_backoff():
+    network._settings.update(settings)
+
+
+class StatusError(Exception):
+    pass
+
+
+class Flaky(object):
+    def __init__(self, failures, error=ConnectionError("down")):
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+
+    def __call__(self, value):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error
+        return value
+
+
+@with_setup(setup_no_backoff, teardown_no_backoff)
+def test_call_with_retries():
+    """
+    Test discerner.network.call_with_retries retries failed calls
+    """
+    flaky = Flaky(network._settings["retries"])
+    eq_(call_with_retries(flaky, (), "views"), "views")
+    eq_(flaky.calls, network._settings["retries"] + 1)
+
+
+@with_setup(setup_no_backoff, teardown_no_backoff)
+@raises(ConnectionError)
+def test_call_with_retries_gives_up():
+    """
+    Test discerner.network.call_with_retries raises once out of retries
+    """
+    call_with_retries(Flaky(network._settings["retries"] + 1), (), "views")
+
+
+@with_setup(setup_no_backoff, teardown_no_backoff)
+def test_call_with_retries_only_retries_server_errors():
+    """
+    Test discerner.network.call_with_retries fails at once on client errors
+    """
+    flaky = Flaky(1, StatusError("HTTP status code 503"))
+    eq_(call_with_retries(flaky, (StatusError,), "views"), "views")
+    eq_(flaky.calls, 2)
+
+    flaky = Flaky(1, StatusError("HTTP status code 404"))
+    try:
+        call_with_retries(flaky, (StatusError,), "views")
+    except StatusError:
+        pass
+    eq_(flaky.calls, 1)
+
+
+def test_failure_budget():
+    """
+    Test discerner.network.FailureBudget runs out after budget failures
+    """
+    budget = FailureBudget(2)
+    budget.fail()
+    eq_(budget.exhausted(), False)
+    budget.fail()
+    eq_(budget.exhausted(), True)
+    eq_(FailureBudget(None).exhausted(), False)
@@ -0,0 +1,75 @@
+"""
+discerner.tests.test_pages
+~~~~~~~~~~~~~~~~~~~~~~~~~~
+"""
+from argparse import Namespace
+import json
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from nose.tools import eq_, with_setup
+from requests.exceptions import ConnectionError
+
+from discerner import network
+from discerner.cache import make_cache_dir
+from discerner.pages import get_sp500, parse_sp500
+
+cache_dir = None
+network_get = network.get
+
+SP500_HTML = """
+<html><body>
+<table class="infobox"><tr><td>X</td><td><a href="/wiki/X">X</a></td></tr>
+</table>
+<table class="wikitable sortable">
+<tr><th>Ticker symbol</th><th>Company</th></tr>
+<tr>
+<td><a href="https://www.nyse.com/quote/XNYS:MMM">MMM</a></td>
+<td><a href="/wiki/3M" title="3M">3M Company</a></td>
+</tr>
+<tr>
+<td><a href="http://www.nasdaq.com/symbol/aapl">AAPL</a></td>
+<td><a href="/wiki/Apple_Inc." title="Apple Inc.">Apple Inc.</a></td>
+</tr>
+<tr><td>XYZ</td><td>No page</td></tr>
+</table>
+</body></html>
+"""
+
+
+def test_parse_sp500():
+    """
+    Test discerner.pages.parse_sp500 only reads the constituents table
+    """
+    eq_(parse_sp500(SP500_HTML), {"MMM": "3M", "AAPL": "Apple_Inc."})
+
+
+def setup_offline():
+    global cache_dir
+    cache_dir = mkdtemp()
+
+    def get(url, **kwargs):
+        raise ConnectionError("offline")
+    network.get = get
+
+
+def teardown_offline():
+    network.get = network_get
+    rmtree(cache_dir)
+
+
+@with_setup(setup_offline, teardown_offline)
+def test_get_sp500_falls_back_to_cache():
+    """
+    Test discerner.pages.get_sp500 keeps using a stale cached list when
+    wikipedia can not be reached
+    """
+    path = join(make_cache_dir(cache_dir, "pages"), "sp500.json")
+    with open(path, "w") as file_:
+        json.dump({
+            "pages": {"MMM": "3M"}, "etag": "abc", "last_modified": None,
+            "checked": 0,
+        }, file_)
+    args = Namespace(cache_dir=cache_dir, cache_ttl=1, no_cache=False)
+    eq_(get_sp500(args), {"MMM": "3M"})
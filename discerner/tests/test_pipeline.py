@@ -0,0 +1,61 @@
+"""
+discerner.tests.test_pipeline
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+"""
+from multiprocessing.pool import ThreadPool
+
+from nose.tools import eq_, raises
+
+from discerner.pipeline import map_processes, map_threaded
+
+
+def square(value):
+    return value * value
+
+
+def fail(value):
+    raise ValueError(value)
+
+
+def test_map_threaded():
+    """
+    Test discerner.pipeline.map_threaded returns every result
+    """
+    results = map_threaded(square, iter(range(50)), 4)
+    eq_(sorted(results), map(square, range(50)))
+
+
+def test_map_threaded_is_lazy():
+    """
+    Test discerner.pipeline.map_threaded does not run ahead of its consumer
+    by more than its buffers
+    """
+    consumed = []
+
+    def items():
+        for value in range(1000):
+            consumed.append(value)
+            yield value
+
+    results = map_threaded(square, items(), 2, buffer_size=2)
+    next(results)
+    results.close()
+    assert len(consumed) < 20
+
+
+@raises(ValueError)
+def test_map_threaded_error_raised():
+    """
+    Test discerner.pipeline.map_threaded raises errors of its workers
+    """
+    list(map_threaded(fail, range(5), 2))
+
+
+def test_map_processes():
+    """
+    Test discerner.pipeline.map_processes returns results in order
+    """
+    pool = ThreadPool(3)
+    results = map_processes(square, range(20), pool, 4)
+    eq_(list(results), map(square, range(20)))
+    pool.terminate()
@@ -0,0 +1,27 @@
+"""
+discerner.tests.test_prices
+~~~~~~~~~~~~~~~~~~~~~~~~~~~
+"""
+from math import isnan
+
+from nose.tools import eq_
+
+from discerner.prices import parse_price_csv
+
+
+def test_parse_price_csv():
+    """
+    Test discerner.prices.parse_price_csv fills days without prices with NaN
+    """
+    lines = [
+        "Date,Open,High,Low,Close,Volume,Adj Close",
+        "2013-01-04,3,3,3,3,100,2.5",
+        "2013-01-02,1,1,1,1,100,1.5",
+        "2012-12-31,0,0,0,0,100,0.5",
+    ]
+    prices = parse_price_csv(lines, "2013-01-01", "2013-01-05")
+    eq_(len(prices), 5)
+    eq_(prices[1], 1.5)
+    eq_(prices[3], 2.5)
+    for day in (0, 2, 4):
+        assert isnan(prices[day])
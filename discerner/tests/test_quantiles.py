@@ -0,0 +1,71 @@
+"""
+discerner.tests.test_quantiles
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+"""
+from nose.tools import assert_almost_equal, eq_
+from numpy import isnan, nan, percentile
+from numpy.random import RandomState
+
+from discerner.quantiles import (
+    find_rolling_outliers, rolling_quantiles, RollingQuantile
+)
+
+
+def test_rolling_quantile():
+    """
+    Test discerner.quantiles.RollingQuantile matches numpy over its window
+    """
+    values = RandomState(0).randint(0, 1000, size=200)
+    rolling = RollingQuantile(30, .9)
+    eq_(rolling.quantile(), None)
+    for end, value in enumerate(values, 1):
+        rolling.push(value)
+        window = values[max(0, end - 30):end]
+        assert_almost_equal(rolling.quantile(), percentile(window, 90))
+    eq_(len(rolling), 30)
+
+
+def test_rolling_quantiles():
+    """
+    Test discerner.quantiles.rolling_quantiles matches RollingQuantile fed
+    with the views before every day, skipping NaN and waiting for
+    min_periods views
+    """
+    views = RandomState(1).randint(0, 100, size=(4, 60)).astype(float)
+    views[2, :10] = nan
+    views[3, 20:25] = nan
+    views[1, ::7] = nan
+    quantiles = rolling_quantiles(views, 20, .9, min_periods=5)
+    for page in xrange(4):
+        rolling = RollingQuantile(20, .9)
+        for day in xrange(60):
+            if len(rolling) < 5:
+                assert isnan(quantiles[page, day])
+            else:
+                assert_almost_equal(quantiles[page, day], rolling.quantile())
+            if not isnan(views[page, day]):
+                rolling.push(views[page, day])
+    assert isnan(quantiles[2, :15]).all()
+    assert_almost_equal(
+        rolling_quantiles(views[0], 20, .9)[-1], quantiles[0, -1]
+    )
+
+
+def test_find_rolling_outliers():
+    """
+    Test discerner.quantiles.find_rolling_outliers for a block of pages
+    """
+    data = {
+        "2013-01-01": 10, "2013-01-02": 12, "2013-01-03": 30,
+        "2013-01-04": 11, "2013-01-05": 13, "2013-01-06": 14,
+    }
+    short = {"2013-01-01": 5, "2013-01-02": 1, "2013-01-03": 9}
+    results = find_rolling_outliers([data, {}, short], 3, .5, min_periods=2)
+    eq_(results[0], (
+        [("2013-01-03", 30), ("2013-01-05", 13), ("2013-01-06", 14)], 13
+    ))
+    eq_(results[1], ([], None))
+    eq_(results[2], ([("2013-01-03", 9)], 3))
+    outliers, _ = find_rolling_outliers([data], 3, .5, min_periods=3)[0]
+    eq_(outliers[0], ("2013-01-05", 13))
+    eq_(find_rolling_outliers([], 3, .5), [])
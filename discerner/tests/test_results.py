@@ -0,0 +1,88 @@
+"""
+discerner.tests.test_results
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+"""
+from pickle import dumps, loads
+
+from nose.tools import eq_
+
+from discerner.results import EventResults
+
+
+def make_results(symbol, interval, pre, post):
+    results = EventResults()
+    dates = ["2013-01-0{}".format(day + 1) for day in range(len(pre))]
+    results.append(symbol, dates, interval, pre, post)
+    return results
+
+
+def test_event_results_returns():
+    """
+    Test discerner.results.EventResults.returns selects events by interval
+    """
+    results = make_results("AAPL", 5, [.1, .2], [-.1, -.2])
+    results.append("MSFT", ["2013-01-05"], 10, [.3], [.4])
+    eq_(len(results), 3)
+    eq_(results.intervals(), [5, 10])
+    pre, post = results.returns(5)
+    eq_(list(pre), [.1, .2])
+    eq_(list(post), [-.1, -.2])
+
+
+def test_event_results_merge():
+    """
+    Test discerner.results.EventResults.merge remaps symbols of the merged
+    results, including ones that went through pickling
+    """
+    results = make_results("AAPL", 5, [.1], [.2])
+    other = loads(dumps(make_results("MSFT", 5, [.3, .4], [.5, .6])))
+    other.append("AAPL", ["2013-02-01"], 5, [.7], [.8])
+    results.merge(other)
+    eq_(results.symbols, ["AAPL", "MSFT"])
+    eq_(list(results.column("symbol")), [0, 1, 1, 0])
+    eq_(list(results.column("pre")), [.1, .3, .4, .7])
+
+
+def test_event_results_sort():
+    """
+    Test discerner.results.EventResults.sort orders events by symbol,
+    interval and date
+    """
+    results = make_results("MSFT", 10, [.1, .2], [.3, .4])
+    results.merge(make_results("AAPL", 5, [.5], [.6]))
+    results.append("MSFT", ["2013-01-01"], 5, [.7], [.8])
+    results.sort()
+    eq_(results.symbols, ["AAPL", "MSFT"])
+    eq_(list(results.column("symbol")), [0, 1, 1, 1])
+    eq_(list(results.column("interval")), [5, 5, 10, 10])
+    eq_(list(results.column("pre")), [.5, .7, .1, .2])
+
+
+def test_event_results_probabilities():
+    """
+    Test discerner.results.EventResults.returns selects events by probability
+    """
+    results = EventResults()
+    results.append("AAPL", ["2013-01-01"], 5, [.1], [.2], probability=.9)
+    results.append("AAPL", ["2013-01-01"], 5, [.3], [.4], probability=.8)
+    results.append("AAPL", ["2013-01-02"], 5, [.5], [.6], random=True)
+    eq_(list(results.returns(5, probability=.8)[0]), [.3])
+    eq_(list(results.returns(5)[0]), [.1, .3])
+
+
+def test_event_results_curves():
+    """
+    Test discerner.results.EventResults keeps curves through merging and
+    sorting
+    """
+    results = EventResults()
+    results.append_curves("MSFT", ["2013-01-01"], [[.1, 0, .2]], .9)
+    other = EventResults()
+    other.append_curves("AAPL", ["2013-01-02"], [[.3, 0, .4]], .8)
+    results.merge(other)
+    results.sort()
+    eq_(results.symbols, ["AAPL", "MSFT"])
+    eq_([chunk["symbol"][0] for chunk in results.curve_chunks], [1, 0])
+    dates, curves = results.curves(.9)
+    eq_(str(dates[0]), "2013-01-01")
+    eq_(curves.tolist(), [[.1, 0, .2]])
@@ -0,0 +1,144 @@
+"""
+discerner.tests.test_server
+~~~~~~~~~~~~~~~~~~~~~~~~~~~
+"""
+from BaseHTTPServer import HTTPServer
+from cStringIO import StringIO
+import os
+from os.path import join
+from shutil import rmtree
+import sys
+from tempfile import mkdtemp
+from threading import Thread
+
+from nose.tools import eq_, with_setup
+
+from discerner import network, prices
+from discerner.server import (
+    QueryHandler, TOKEN_HEADER, query, read_token, run_query, token_path,
+    write_token
+)
+
+server = None
+data_dir = None
+
+
+def setup_server():
+    global server, data_dir
+    data_dir = mkdtemp()
+    with open(join(data_dir, "AAPL.csv"), "w") as file_:
+        file_.write("Date,Open,High,Low,Close,Volume,Adj Close\n")
+        for day in xrange(1, 29):
+            file_.write("2013-02-{:02},1,1,1,1,1,{}\n".format(day, day))
+    server = HTTPServer(("127.0.0.1", 0), QueryHandler)
+    server.token = write_token(data_dir, server.server_address[1])
+    Thread(target=server.serve_forever).start()
+
+
+def teardown_server():
+    server.shutdown()
+    server.server_close()
+    rmtree(data_dir)
+
+
+def run_client(argv):
+    """
+    Query our server, returning its status along with what it printed
+    """
+    stdout, stderr = sys.stdout, sys.stderr
+    sys.stdout, sys.stderr = StringIO(), StringIO()
+    try:
+        status = query(server.server_address, argv, data_dir)
+        return status, sys.stdout.getvalue(), sys.stderr.getvalue()
+    finally:
+        sys.stdout, sys.stderr = stdout, stderr
+
+
+def test_run_query_captures_errors():
+    """
+    Test discerner.server.run_query returns the status and output of a
+    query without touching our own output or working directory
+    """
+    stdout, cwd = sys.stdout, os.getcwd()
+    status, output, errors = run_query(["-t", "SOMETIMES"], "/")
+    eq_(status, 2)
+    eq_(output, "")
+    assert "invalid choice" in errors
+    assert sys.stdout is stdout
+    eq_(os.getcwd(), cwd)
+
+
+@with_setup(setup_server, teardown_server)
+def test_query_round_trip():
+    """
+    Test discerner.server.query runs queries on the server, which keeps its
+    price cache and http session between them
+    """
+    argv = [
+        "-t", "RANDOM", "--price-source", "csv", "--price-dir", data_dir,
+        "--cache-dir", data_dir, "--start", "2013-02-01", "--end",
+        "2013-02-28", "-i", "2", "--seed", "1", "custom", "AAPL:Apple_Inc",
+    ]
+    status, output, errors = run_client(argv)
+    eq_(status, 0)
+    assert "Interval: 2" in output
+    assert "Finished" in errors
+    session = network.get_session()
+    sources = dict(prices._sources)
+
+    eq_(run_client(argv)[:2], (status, output))
+    assert network.get_session() is session
+    eq_(prices._sources, sources)
+
+    eq_(run_client(["-t", "SOMETIMES"])[0], 2)
+
+
+@with_setup(setup_server, teardown_server)
+def test_query_handler_refuses_web_pages():
+    """
+    Test discerner.server.QueryHandler only runs json posted for its own host
+    with its token
+    """
+    url = "http://127.0.0.1:{}/".format(server.server_address[1])
+    body = '{"argv": ["-t", "RANDOM"], "cwd": "/"}'
+    headers = {"Content-Type": "text/plain", TOKEN_HEADER: server.token}
+    response = network.get_session().post(url, data=body, headers=headers)
+    eq_(response.status_code, 415)
+    headers.update({
+        "Content-Type": "application/json", "Host": "evil.example:80"
+    })
+    response = network.get_session().post(url, data=body, headers=headers)
+    eq_(response.status_code, 403)
+    del headers["Host"]
+    headers[TOKEN_HEADER] = "guess"
+    response = network.get_session().post(url, data=body, headers=headers)
+    eq_(response.status_code, 403)
+
+
+@with_setup(setup_server, teardown_server)
+def test_write_token():
+    """
+    Test discerner.server.write_token keeps its token from other users
+    """
+    port = server.server_address[1]
+    eq_(read_token(data_dir, port), server.token)
+    eq_(os.stat(token_path(data_dir, port)).st_mode & 0777, 0600)
+    eq_(read_token(data_dir, port + 1), None)
+
+
+def test_query_without_server():
+    """
+    Test discerner.server.query reports servers it can not reach
+    """
+    directory = mkdtemp()
+    stderr = sys.stderr
+    sys.stderr = StringIO()
+    try:
+        eq_(query(("127.0.0.1", 1), ["-t", "RANDOM"], directory), 1)
+        assert "No token" in sys.stderr.getvalue()
+        write_token(directory, 1)
+        eq_(query(("127.0.0.1", 1), ["-t", "RANDOM"], directory), 1)
+        assert "Could not query" in sys.stderr.getvalue()
+    finally:
+        sys.stderr = stderr
+        rmtree(directory)
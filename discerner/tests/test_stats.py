@@ -0,0 +1,86 @@
+"""
+discerner.tests.test_stats
+~~~~~~~~~~~~~~~~~~~~~~~~~~
+"""
+from nose.tools import assert_almost_equal, eq_
+from numpy import array, isnan, log, nan, zeros
+from numpy.random import RandomState
+
+from discerner.stats import (
+    bootstrap_flip_rate, compare_flip_rates, conditional_returns,
+    EqualWeightedIndex, mean_curve, sign_flips
+)
+
+
+def test_sign_flips():
+    """
+    Test discerner.stats.sign_flips
+    """
+    flips = sign_flips([1, -1, 1, 0, -2], [-1, 1, 1, -1, -2])
+    eq_(list(flips), [True, True, False, False, False])
+
+
+def test_conditional_returns():
+    """
+    Test discerner.stats.conditional_returns splits post returns by the sign
+    of the pre return
+    """
+    distributions = conditional_returns([1, 2, -1], [.1, .3, -.5])
+    eq_(distributions["up"]["count"], 2)
+    eq_(distributions["up"]["percentiles"][50], .2)
+    eq_(distributions["down"]["mean"], -.5)
+    eq_(distributions["flat"]["count"], 0)
+
+
+def test_compare_flip_rates():
+    """
+    Test discerner.stats.compare_flip_rates for clearly different and equal
+    flip rates
+    """
+    random_state = RandomState(0)
+    flips = zeros(500, dtype=bool)
+    flips[:400] = True
+    baseline = zeros(500, dtype=bool)
+    baseline[:250] = True
+    difference, p_value = compare_flip_rates(
+        flips, baseline, 1000, random_state
+    )
+    assert_almost_equal(difference, .3)
+    assert p_value < .01
+
+    difference, p_value = compare_flip_rates(
+        baseline, baseline, 1000, random_state
+    )
+    eq_(difference, 0)
+    eq_(p_value, 1)
+
+
+def test_bootstrap_flip_rate():
+    """
+    Test discerner.stats.bootstrap_flip_rate surrounds the observed rate
+    """
+    flips = array([True, False] * 500)
+    low, high = bootstrap_flip_rate(flips, 1000, RandomState(0))
+    assert low < .5 < high
+
+
+def test_mean_curve():
+    """
+    Test discerner.stats.mean_curve leaves missing offsets out of averages
+    """
+    mean, low, high = mean_curve([[nan, 0, .1], [nan, 0, .3], [.2, 0, nan]])
+    eq_(mean[0], .2)
+    assert isnan(low[0])
+    assert_almost_equal(mean[2], .2)
+    assert low[2] < .2 < high[2]
+
+
+def test_equal_weighted_index():
+    """
+    Test discerner.stats.EqualWeightedIndex averages the daily log returns of
+    the stocks priced on both days
+    """
+    index = EqualWeightedIndex()
+    index.add(log([1.0, 2.0, 4.0]))
+    index.add(log([nan, 1.0, 1.0]))
+    eq_(list(index.log_prices()), [0, log(2), log(2) + log(2) / 2])
@@ -0,0 +1,100 @@
+"""
+discerner.tests.test_store
+~~~~~~~~~~~~~~~~~~~~~~~~~~
+"""
+from cPickle import dumps, loads
+
+from nose.tools import eq_, raises, with_setup
+from numpy import isnan, memmap, nan
+
+from discerner.store import PriceStore, resolve_prices
+from discerner.tests import (
+    PriceSource, setup_temp_dir, teardown_temp_dir, temp_dir
+)
+
+
+@with_setup(setup_temp_dir, teardown_temp_dir)
+def test_price_store_shares_a_matrix():
+    """
+    Test discerner.store.PriceStore keeps every symbol in one matrix that
+    later stores map instead of downloading again
+    """
+    source = PriceSource({"AAPL": [1.0, 2.0, 3.0], "MSFT": [4.0, nan, 6.0]})
+    store = PriceStore(source, temp_dir(), capacity=1)
+    eq_(list(store.load("AAPL", "2013-01-01", "2013-01-03")), [1.0, 2.0, 3.0])
+    prices = store.load("MSFT", "2013-01-02", "2013-01-03")
+    assert isnan(prices[0])
+    eq_(prices[1], 6.0)
+    eq_(store.index["capacity"], 2)
+
+    store = PriceStore(source, temp_dir())
+    eq_(list(store.load("AAPL", "2013-01-02", "2013-01-03")), [2.0, 3.0])
+    eq_(len(source.calls), 2)
+
+
+@with_setup(setup_temp_dir, teardown_temp_dir)
+def test_price_store_appends_and_prepends_days():
+    """
+    Test discerner.store.PriceStore only downloads the days it is missing
+    """
+    source = PriceSource({"SPY": [1.0, 2.0, 3.0, 4.0, 5.0]})
+    store = PriceStore(source, temp_dir())
+    store.load("SPY", "2013-01-02", "2013-01-03")
+    store.index["fetched"]["SPY"] = "2013-01-03"
+    prices = store.load("SPY", "2013-01-02", "2013-01-05")
+    eq_(list(prices), [2.0, 3.0, 4.0, 5.0])
+    eq_(source.calls[-1], ("SPY", "2013-01-04", "2013-01-05"))
+
+    prices = store.load("SPY", "2013-01-01", "2013-01-05")
+    eq_(store.index["start"], "2013-01-01")
+    eq_(source.calls[-1], ("SPY", "2013-01-01", "2013-01-05"))
+    eq_(list(prices), [1.0, 2.0, 3.0, 4.0, 5.0])
+
+
+@with_setup(setup_temp_dir, teardown_temp_dir)
+def test_price_stores_share_their_files():
+    """
+    Test discerner.store.PriceStore picks up symbols that another store on
+    the same files added in the meantime
+    """
+    source = PriceSource({"AAPL": [1.0, 2.0], "MSFT": [3.0, 4.0]})
+    first = PriceStore(source, temp_dir(), capacity=1)
+    second = PriceStore(source, temp_dir(), capacity=1)
+    first.load("AAPL", "2013-01-01", "2013-01-02")
+    eq_(list(second.load("MSFT", "2013-01-01", "2013-01-02")), [3.0, 4.0])
+    eq_(list(first.load("MSFT", "2013-01-01", "2013-01-02")), [3.0, 4.0])
+    eq_(list(second.load("AAPL", "2013-01-01", "2013-01-02")), [1.0, 2.0])
+    eq_(len(source.calls), 2)
+    eq_(first.index["capacity"], 2)
+
+
+@with_setup(setup_temp_dir, teardown_temp_dir)
+@raises(ValueError)
+def test_price_store_loads_read_only_views():
+    """
+    Test discerner.store.PriceStore hands out read only views of its matrix,
+    even for days that have not been quoted yet
+    """
+    source = PriceSource({"AAPL": [1.0, 2.0]})
+    store = PriceStore(source, temp_dir())
+    prices = store.load("AAPL", "2013-01-01", "2013-01-04")
+    assert isinstance(prices, memmap)
+    eq_(list(prices[:2]), [1.0, 2.0])
+    assert isnan(prices[2:]).all()
+    prices[0] = -1.0
+
+
+@with_setup(setup_temp_dir, teardown_temp_dir)
+def test_prices_reference():
+    """
+    Test discerner.store.PricesReference sends where prices are instead of
+    the prices themselves
+    """
+    source = PriceSource({"AAPL": [1.0, 2.0, 3.0]})
+    prices = PriceStore(source, temp_dir()).load(
+        "AAPL", "2013-01-02", "2013-01-03"
+    )
+    reference = loads(dumps(prices.reference))
+    eq_(reference.length, 2)
+    eq_(list(resolve_prices(reference)), [2.0, 3.0])
+    eq_(resolve_prices(prices) is prices, True)
@@ -0,0 +1,112 @@
+"""
+discerner.tests.test_watch
+~~~~~~~~~~~~~~~~~~~~~~~~~~
+"""
+from argparse import Namespace
+
+from nose.tools import eq_, with_setup
+
+from discerner import watch
+from discerner.utils import today
+
+reported = []
+fetched = []
+fetched_views = {}
+originals = {}
+
+
+def report(args, key, outliers, quantile, results, prices):
+    reported.extend((key, date, views) for date, views in outliers)
+
+
+def fetch(args, pages):
+    fetched.append(args)
+    return [(key, page, fetched_views.get(page)) for key, page in pages]
+
+
+def setup_watch():
+    originals.update(
+        for_recent_views=watch.for_recent_views,
+        fetch_page_views=watch.fetch_page_views
+    )
+    watch.for_recent_views = report
+    watch.fetch_page_views = fetch
+
+
+def teardown_watch():
+    for name, value in originals.iteritems():
+        setattr(watch, name, value)
+    del reported[:]
+    del fetched[:]
+    fetched_views.clear()
+
+
+def make_args(**kwargs):
+    defaults = dict(
+        window=5, probability=[.5], min_periods=1, watch=60.0,
+        cache_ttl=12, end="2013-01-01", data_type="RECENT"
+    )
+    defaults.update(kwargs)
+    return Namespace(**defaults)
+
+
+@with_setup(setup_watch, teardown_watch)
+def test_update_page_reports_first_poll():
+    """
+    Test discerner.watch.update_page reports the outliers of every day on the
+    first poll of a page
+    """
+    states = {}
+    data = {"2013-01-01": 10, "2013-01-02": 30, "2013-01-03": 20}
+    watch.update_page(make_args(), "AAPL", "Apple_Inc", data, states)
+    eq_(reported, [("AAPL", "2013-01-02", 30)])
+    eq_(states["Apple_Inc"][0], "2013-01-03")
+    eq_(len(states["Apple_Inc"][1]), 3)
+
+
+@with_setup(setup_watch, teardown_watch)
+def test_update_page_only_pushes_new_days():
+    """
+    Test discerner.watch.update_page only looks at days it has not seen yet
+    """
+    args, states = make_args(), {}
+    data = {"2013-01-01": 10, "2013-01-02": 30, "2013-01-03": 20}
+    watch.update_page(args, "AAPL", "Apple_Inc", data, states)
+    del reported[:]
+
+    data.update({"2013-01-02": 1000, "2013-01-04": 40, "2013-01-05": 5})
+    watch.update_page(args, "AAPL", "Apple_Inc", data, states)
+    eq_(reported, [("AAPL", "2013-01-04", 40)])
+    eq_(states["Apple_Inc"][0], "2013-01-05")
+    eq_(len(states["Apple_Inc"][1]), 5)
+
+
+@with_setup(setup_watch, teardown_watch)
+def test_update_page_waits_for_min_periods():
+    """
+    Test discerner.watch.update_page reports nothing new until the window
+    holds min_periods views
+    """
+    args, states = make_args(min_periods=3), {}
+    watch.update_page(args, "AAPL", "Apple_Inc", {"2013-01-01": 10}, states)
+    del reported[:]
+
+    data = {"2013-01-02": 20, "2013-01-03": 30, "2013-01-04": 40}
+    watch.update_page(args, "AAPL", "Apple_Inc", data, states)
+    eq_(reported, [("AAPL", "2013-01-04", 40)])
+
+
+@with_setup(setup_watch, teardown_watch)
+def test_poll_pages():
+    """
+    Test discerner.watch.poll_pages fetches views that are only fresh for a
+    single poll up to today, and skips pages that could not be fetched
+    """
+    args, states = make_args(watch=1800.0), {}
+    fetched_views["Apple_Inc"] = {"2013-01-01": 10}
+    pages = {"AAPL": "Apple_Inc", "MSFT": "Microsoft"}
+    watch.poll_pages(args, pages, states)
+    eq_(fetched[0].cache_ttl, .5)
+    eq_(fetched[0].end, today())
+    eq_((args.cache_ttl, args.end), (12, "2013-01-01"))
+    eq_(states.keys(), ["Apple_Inc"])
@@ -0,0 +1,29 @@
+"""
+discerner.utils
+~~~~~~~~~~~~~~~
+"""
+from datetime import datetime, timedelta
+
+DATE_FORMAT = "%Y-%m-%d"
+
+
+def add_days(date, days):
+    """
+    Shift a "%Y-%m-%d" date string by a number of days
+    """
+    return (to_datetime(date) + timedelta(days=days)).strftime(DATE_FORMAT)
+
+
+def days_between(start, end):
+    """
+    Number of days from start to end where both are "%Y-%m-%d" strings
+    """
+    return (to_datetime(end) - to_datetime(start)).days
+
+
+def to_datetime(date):
+    return datetime.strptime(date, DATE_FORMAT)
+
+
+def today():
+    return datetime.today().strftime(DATE_FORMAT)
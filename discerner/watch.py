@@ -0,0 +1,74 @@
+"""
+discerner.watch
+~~~~~~~~~~~~~~~
+"""
+from copy import copy
+from time import sleep
+
+from discerner import cruncher
+from discerner.analyze import for_recent_views, skip_page
+from discerner.defaults import logger
+from discerner.fetcher import fetch_page_views
+from discerner.quantiles import RollingQuantile
+from discerner.utils import today
+
+
+def watch_pages(args):
+    """
+    Keep checking our pages for RECENT outliers every args.watch seconds.
+    The views and outlier threshold of every page stay in memory between
+    polls so each poll only has to look at the days that are new.
+    """
+    pages = cruncher.get_pages(args)
+    states = {}
+    try:
+        while True:
+            poll_pages(args, pages, states)
+            sleep(args.watch)
+    except KeyboardInterrupt:
+        logger.info("Stopped watching")
+
+
+def poll_pages(args, pages, states):
+    """
+    Fetch the views of all pages once and report their new outliers
+    """
+    poll_args = copy(args)
+    # Cached views are only good for a single poll and the last day moves on
+    # while we are running
+    poll_args.cache_ttl = args.watch / 60.0 / 60.0
+    poll_args.end = today()
+    for key, page, data in fetch_page_views(poll_args, pages.iteritems()):
+        if not skip_page(args, key, page, data, []):
+            update_page(args, key, page, data, states)
+
+
+def update_page(args, key, page, data, states):
+    """
+    Push the days of data we have not seen yet into the rolling quantile of
+    page, reporting the ones above the threshold as they arrive. The first
+    poll of a page reports outliers the same way a single RECENT run does
+    """
+    days = sorted(data.iteritems())
+    if not days:
+        return
+
+    if page not in states:
+        rolling = RollingQuantile(
+            args.window, args.probability[0], [views for _, views in days]
+        )
+        quantile = rolling.quantile()
+        outliers = [(date, views) for date, views in days if views > quantile]
+        for_recent_views(args, key, outliers, quantile, None, None)
+    else:
+        last_day, rolling = states[page]
+        for date, views in days:
+            if date <= last_day:
+                continue
+            quantile = rolling.quantile()
+            if len(rolling) >= args.min_periods and views > quantile:
+                for_recent_views(
+                    args, key, [(date, views)], quantile, None, None
+                )
+            rolling.push(views)
+    states[page] = (days[-1][0], rolling)